@@ -0,0 +1,480 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from chunker import chunk_text, estimate_tokens
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules each entry point must not load at import time; they are imported on
+# the code paths that use them.
+LAZY_MODULES = {
+    'main': ('PyPDF2', 'requests', 'ollama'),
+    'cli': ('PyQt5', 'PyPDF2', 'requests', 'ollama'),
+    'translator': ('PyQt5', 'PyPDF2', 'ollama'),
+}
+WATCHED_MODULES = ('PyQt5', 'PyPDF2', 'requests', 'ollama')
+STARTUP_BUDGET_SECONDS = 2.0
+
+WINDOW_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import main
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+window = main.PDFDropWidget()
+window.show()
+app.processEvents()
+print(json.dumps({'seconds': time.perf_counter() - started,
+                  'loaded': [name for name in %r if name in sys.modules]}))
+'''
+
+WORDS = "the quick brown fox jumps over a lazy dog while translators read long contracts and technical manuals".split()
+
+
+def make_text(size, seed=0):
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < size:
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            sentences.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + '.')
+        paragraph = ' '.join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return '\n\n'.join(paragraphs)[:size]
+
+
+def write_pdf(path, pages, lines_per_page=45, seed=0):
+    rng = random.Random(seed)
+    page_count = len(pages) if isinstance(pages, list) else pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_index in range(page_count):
+        if isinstance(pages, list):
+            lines = pages[page_index].split('\n')
+        else:
+            lines = [' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.' for _ in range(lines_per_page)]
+        text_ops = ''.join(
+            '(' + line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ') Tj T* '
+            for line in lines
+        )
+        content = f"BT /F1 10 Tf 12 TL 50 780 Td {text_ops}ET".encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, 'wb') as file:
+        file.write(output)
+    return path
+
+
+def fixed_slices(text, max_length=5000):
+    return [text[start:start + max_length] for start in range(0, len(text), max_length)]
+
+
+def time_call(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_chunker(args):
+    results = []
+    for size in args.sizes:
+        text = make_text(size)
+        edited = text[:size // 3] + "An inserted sentence shifts everything after it. " + text[size // 3:]
+
+        slice_time, slices = time_call(lambda: fixed_slices(text, args.max_length), args.repeat)
+        chunk_time, chunks = time_call(lambda: chunk_text(text, args.max_tokens), args.repeat)
+
+        results.append({
+            'size_chars': len(text),
+            'slicer_seconds': slice_time,
+            'slicer_chunks': len(slices),
+            'slicer_reused_after_edit': len(set(slices) & set(fixed_slices(edited, args.max_length))),
+            'chunker_seconds': chunk_time,
+            'chunker_chunks': len(chunks),
+            'chunker_max_tokens': max((estimate_tokens(chunk) for chunk in chunks), default=0),
+            'chunker_reused_after_edit': len(set(chunks) & set(chunk_text(edited, args.max_tokens))),
+            'chunker_mb_per_second': len(text) / chunk_time / 1e6 if chunk_time else None,
+        })
+    return {'benchmark': 'chunker', 'results': results}
+
+
+def bench_extraction(args):
+    from extraction import iter_pages
+    import PyPDF2
+
+    if args.pdf:
+        pdf_path = args.pdf
+    else:
+        pdf_path = os.path.join(tempfile.mkdtemp(prefix='pdf-gpt-bench-'), f'synthetic_{args.pages}.pdf')
+        write_pdf(pdf_path, args.pages)
+
+    def serial_loop():
+        with open(pdf_path, 'rb') as file:
+            return [page.extract_text() for page in PyPDF2.PdfReader(file).pages]
+
+    serial_time, serial_pages = time_call(serial_loop, args.repeat)
+    results = [{'mode': 'serial', 'workers': 1, 'seconds': serial_time, 'pages_per_second': len(serial_pages) / serial_time}]
+    for workers in args.workers:
+        elapsed, pages = time_call(lambda: [text for _, _, text in iter_pages(pdf_path, workers)], args.repeat)
+        results.append({
+            'mode': 'process-pool' if workers > 1 else 'iter_pages',
+            'workers': workers,
+            'seconds': elapsed,
+            'pages_per_second': len(pages) / elapsed,
+            'speedup': serial_time / elapsed,
+            'matches_serial': pages == [text or '' for text in serial_pages],
+        })
+    return {'benchmark': 'extraction', 'pdf': pdf_path, 'pages': len(serial_pages), 'results': results}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def pipeline_case(pdf_path, base_url, model, concurrency, extraction_workers, max_tokens):
+    from extraction import iter_pages
+    from ollama_client import OllamaClient
+    from translator import Translator
+
+    started = time.perf_counter()
+    page_count = sum(1 for _ in iter_pages(pdf_path, extraction_workers))
+    extraction_seconds = time.perf_counter() - started
+    extraction_peak_rss_mb = peak_rss_mb()
+
+    translator = Translator(
+        None, model, 'spanish', pdf_path,
+        max_tokens=max_tokens,
+        concurrency=concurrency,
+        extraction_workers=extraction_workers,
+        resume=False,
+        client=OllamaClient(base_url, pool_size=max(16, concurrency)),
+    )
+    started = time.perf_counter()
+    output_files = translator.run()
+    wall_seconds = time.perf_counter() - started
+
+    latencies = [result.latency for result in translator.request_stats]
+    first_tokens = [result.time_to_first_token for result in translator.request_stats if result.time_to_first_token is not None]
+    return {
+        'pages': page_count,
+        'pdf_bytes': os.path.getsize(pdf_path),
+        'chunks': len(translator.request_stats),
+        'wall_seconds': wall_seconds,
+        'extraction_seconds': extraction_seconds,
+        'chunk_latency_p50': percentile(latencies, 0.50),
+        'chunk_latency_p90': percentile(latencies, 0.90),
+        'chunk_latency_p99': percentile(latencies, 0.99),
+        'first_token_p50': percentile(first_tokens, 0.50),
+        'output_bytes': sum(os.path.getsize(path) for path in output_files.values()),
+        'extraction_peak_rss_mb': extraction_peak_rss_mb,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_pipeline_case(results, *args):
+    try:
+        results.put(pipeline_case(*args))
+    except Exception as e:
+        results.put({'error': str(e)})
+
+
+def bench_pipeline(args):
+    from mock_ollama import MockOllamaServer
+
+    server = MockOllamaServer(
+        models=[args.model],
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        max_concurrency=args.server_concurrency,
+    ).start()
+    work_dir = tempfile.mkdtemp(prefix='pdf-gpt-bench-')
+    context = multiprocessing.get_context('spawn')
+    cases = []
+    try:
+        for pages in args.pages:
+            pdf_path = write_pdf(os.path.join(work_dir, f'synthetic_{pages}.pdf'), pages)
+            results = context.Queue()
+            # Each case runs in a fresh process so peak RSS belongs to that case alone.
+            process = context.Process(
+                target=run_pipeline_case,
+                args=(results, pdf_path, server.base_url, args.model, args.concurrency, args.extraction_workers, args.max_tokens)
+            )
+            requests_before = server.stats()['requests']
+            process.start()
+            case = results.get()
+            process.join()
+            case['server_requests'] = server.stats()['requests'] - requests_before
+            cases.append(case)
+    finally:
+        server.stop()
+
+    return {
+        'benchmark': 'pipeline',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'concurrency': args.concurrency,
+            'extraction_workers': args.extraction_workers,
+            'max_tokens': args.max_tokens,
+            'server_latency': args.latency,
+            'server_tokens_per_second': args.tokens_per_second,
+            'server_concurrency': args.server_concurrency,
+        },
+        'results': cases,
+    }
+
+
+def make_slides(pages, seed=0):
+    rng = random.Random(seed)
+    slides = []
+    for _ in range(pages):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        bullets = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))).capitalize() + '.' for _ in range(rng.randint(1, 3))]
+        slides.append(title + '.\n\n' + '\n'.join(bullets))
+    return slides
+
+
+def bench_packing(args):
+    from mock_ollama import MockOllamaServer
+    from ollama_client import OllamaClient
+    from translator import PACK_SEGMENT_DIVISOR, Translator
+
+    server = MockOllamaServer(
+        models=[args.model],
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        max_concurrency=args.server_concurrency,
+    ).start()
+    work_dir = tempfile.mkdtemp(prefix='pdf-gpt-bench-')
+    pdf_path = write_pdf(os.path.join(work_dir, f'slides_{args.pages}.pdf'), make_slides(args.pages))
+    client = OllamaClient(server.base_url, pool_size=max(16, args.concurrency))
+    cases = []
+    try:
+        for pack in (False, True):
+            # The unpacked case cuts the same small segments but sends one request each.
+            translator = Translator(
+                None, args.model, 'spanish', pdf_path,
+                max_tokens=args.max_tokens if pack else args.max_tokens // PACK_SEGMENT_DIVISOR,
+                concurrency=args.concurrency,
+                resume=False,
+                client=client,
+                pack=pack,
+            )
+            before = server.stats()
+            started = time.perf_counter()
+            output_files = translator.run()
+            wall_seconds = time.perf_counter() - started
+            after = server.stats()
+            cases.append({
+                'mode': 'packed' if pack else 'per-segment',
+                'requests': after['requests'] - before['requests'],
+                'prompt_tokens': after['prompt_tokens'] - before['prompt_tokens'],
+                'fallbacks': translator.packed_fallbacks,
+                'wall_seconds': wall_seconds,
+                'output_bytes': sum(os.path.getsize(path) for path in output_files.values()),
+            })
+    finally:
+        client.close()
+        server.stop()
+
+    unpacked, packed = cases
+    return {
+        'benchmark': 'packing',
+        'pages': args.pages,
+        'settings': {'max_tokens': args.max_tokens, 'concurrency': args.concurrency, 'server_latency': args.latency},
+        'results': cases,
+        'request_reduction': 1 - packed['requests'] / unpacked['requests'] if unpacked['requests'] else None,
+        'prompt_token_reduction': 1 - packed['prompt_tokens'] / unpacked['prompt_tokens'] if unpacked['prompt_tokens'] else None,
+    }
+
+
+def parse_importtime(stderr, limit):
+    # "import time: self [us] | cumulative | imported package"; nested imports are
+    # indented two spaces per level. Top-level imports and what they pull in directly
+    # are enough to see which dependency a launch is waiting for.
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth <= 1:
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    imports.sort(reverse=True)
+    return [{'module': name, 'seconds': seconds} for seconds, name in imports[:limit]]
+
+
+def run_probe(command, env=None):
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    return time.perf_counter() - started, completed
+
+
+def startup_env():
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def probe_import(module, env, repeat=3, top=8):
+    # Each run is a fresh interpreter, so this is the cost a user pays on every launch.
+    code = f"import json, sys, {module}; print(json.dumps([name for name in {WATCHED_MODULES!r} if name in sys.modules]))"
+    runs = [run_probe([sys.executable, '-X', 'importtime', '-c', code], env) for _ in range(repeat)]
+    seconds, completed = min(runs, key=lambda run: run[0])
+    case = {'case': f'import {module}', 'seconds': seconds}
+    if completed.returncode != 0:
+        case['skipped'] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'
+    else:
+        loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+        case['slowest_imports'] = parse_importtime(completed.stderr, top)
+        case['eager_modules'] = [name for name in LAZY_MODULES.get(module, ()) if name in loaded]
+    return case
+
+
+def probe_window(env, repeat=3):
+    runs = [run_probe([sys.executable, '-c', WINDOW_PROBE % (WATCHED_MODULES,)], env) for _ in range(repeat)]
+    seconds, completed = min(runs, key=lambda run: run[0])
+    case = {'case': 'time to window', 'seconds': seconds}
+    if completed.returncode != 0:
+        case['skipped'] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'
+    else:
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        case['in_process_seconds'] = probe['seconds']
+        case['eager_modules'] = [name for name in LAZY_MODULES['main'] if name in probe['loaded']]
+    return case
+
+
+def startup_failures(case, budget=STARTUP_BUDGET_SECONDS):
+    failures = []
+    if 'skipped' not in case:
+        if case['seconds'] > budget:
+            failures.append(f"{case['case']} took {case['seconds']:.3f}s (budget {budget:.3f}s)")
+        if case['eager_modules']:
+            failures.append(f"{case['case']} loaded {', '.join(case['eager_modules'])} at startup")
+    return failures
+
+
+def bench_startup(args):
+    env = startup_env()
+    cases = [probe_import(module, env, args.repeat, args.top) for module in args.modules]
+    cases.append(probe_window(env, args.repeat))
+    failures = [failure for case in cases for failure in startup_failures(case, args.budget)]
+    return {
+        'benchmark': 'startup',
+        'python': platform.python_version(),
+        'budget_seconds': args.budget,
+        'results': cases,
+        'failures': failures,
+        'passed': not failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF GPT benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    chunker_parser = subparsers.add_parser('chunker', help="Compare the sentence-aware chunker against fixed-size slicing")
+    chunker_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    chunker_parser.add_argument('--max-length', type=int, default=5000)
+    chunker_parser.add_argument('--max-tokens', type=int, default=1200)
+    chunker_parser.add_argument('--repeat', type=int, default=3)
+    chunker_parser.set_defaults(func=bench_chunker)
+
+    extraction_parser = subparsers.add_parser('extraction', help="Compare serial page extraction against the process pool")
+    extraction_parser.add_argument('--pdf', help="PDF to extract (defaults to a generated synthetic PDF)")
+    extraction_parser.add_argument('--pages', type=int, default=500)
+    extraction_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    extraction_parser.add_argument('--repeat', type=int, default=1)
+    extraction_parser.set_defaults(func=bench_extraction)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="End-to-end translation against a local mock Ollama server")
+    pipeline_parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 500])
+    pipeline_parser.add_argument('--model', default='mock')
+    pipeline_parser.add_argument('--concurrency', type=int, default=4)
+    pipeline_parser.add_argument('--extraction-workers', type=int, default=1)
+    pipeline_parser.add_argument('--max-tokens', type=int, default=1200)
+    pipeline_parser.add_argument('--latency', type=float, default=0.05, help="Mock server delay before the first token")
+    pipeline_parser.add_argument('--tokens-per-second', type=float, default=2000.0)
+    pipeline_parser.add_argument('--server-concurrency', type=int, default=4)
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    packing_parser = subparsers.add_parser('packing', help="Requests and prompt tokens with and without request packing")
+    packing_parser.add_argument('--pages', type=int, default=200, help="Slides in the generated deck")
+    packing_parser.add_argument('--model', default='mock')
+    packing_parser.add_argument('--concurrency', type=int, default=4)
+    packing_parser.add_argument('--max-tokens', type=int, default=1200)
+    packing_parser.add_argument('--latency', type=float, default=0.05, help="Mock server delay before the first token")
+    packing_parser.add_argument('--tokens-per-second', type=float, default=2000.0)
+    packing_parser.add_argument('--server-concurrency', type=int, default=4)
+    packing_parser.set_defaults(func=bench_packing)
+
+    startup_parser = subparsers.add_parser('startup', help="Launch time of the entry points; exits with status 1 over budget")
+    startup_parser.add_argument('--modules', nargs='+', default=list(LAZY_MODULES), help="Modules whose import is timed")
+    startup_parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_SECONDS,
+                                help=f"Maximum seconds for each case, interpreter start included (default: {STARTUP_BUDGET_SECONDS})")
+    startup_parser.add_argument('--repeat', type=int, default=3, help="Launches per case; the fastest counts")
+    startup_parser.add_argument('--top', type=int, default=8, help="Slowest top-level imports to report per case")
+    startup_parser.set_defaults(func=bench_startup)
+
+    parser.add_argument('--output', help="Also append the JSON result as one line to this file")
+
+    args = parser.parse_args(argv)
+    result = args.func(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(result) + '\n')
+    return 0 if result.get('passed', True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
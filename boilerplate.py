@@ -0,0 +1,140 @@
+import hashlib
+import re
+from collections import Counter, deque
+
+from chunker import estimate_tokens
+
+# Lines this close to the top or bottom of a page are header/footer candidates
+# whatever their length; elsewhere only long lines (disclaimers, notices) are.
+EDGE_LINES = 3
+MIN_BODY_LINE_CHARS = 40
+
+LETTER_RE = re.compile(r'[^\W\d_]')
+NUMBER_RE = re.compile(r'\d+')
+PLACEHOLDER_RE = re.compile(r'\[\[\s*(B\d{6})\s*\]\]')
+
+
+def normalize_line(line):
+    # Page numbers and dates differ between otherwise identical headers;
+    # any other difference makes it a different line.
+    return NUMBER_RE.sub('#', ' '.join(line.split()))
+
+
+def line_key(normalized):
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
+
+def placeholder_ids(text):
+    return PLACEHOLDER_RE.findall(text)
+
+
+def placeholders_intact(source, translation):
+    return Counter(placeholder_ids(source)) == Counter(placeholder_ids(translation))
+
+
+class Block:
+    def __init__(self, block_id, text):
+        self.block_id = block_id
+        self.text = text
+        self.numbers = NUMBER_RE.findall(text)
+        self.occurrences = 1
+
+
+class BoilerplateFilter:
+    # Streaming pass over extracted pages. The first copy of a line stays in the
+    # text; later copies (identical up to their numbers) become [[Bnnnnnn]]
+    # placeholders, so each block is translated once and spliced back in. Block
+    # IDs come from the line itself, so a chunk's text, and with it its cache
+    # key, does not change when other parts of the document do.
+    def __init__(self):
+        self.seen = set()
+        self.blocks = {}
+        self.blocks_by_key = {}
+        # (block, source line) for every placeholder, in document order.
+        self.occurrences = []
+        self.taken = 0
+        self.saved_chars = 0
+        self.saved_tokens = 0
+
+    def block_id_for(self, key):
+        number = int.from_bytes(key[:4], 'big') % 1000000
+        while f"B{number:06d}" in self.blocks:
+            number = (number + 1) % 1000000
+        return f"B{number:06d}"
+
+    def filter_page(self, text):
+        # Returns the page with repeated lines replaced, plus the blocks that repeated for the first time.
+        lines = text.split('\n')
+        content_rows = [index for index, line in enumerate(lines) if line.strip()]
+        edge_rows = set(content_rows[:EDGE_LINES] + content_rows[-EDGE_LINES:])
+        new_blocks = []
+        for index in content_rows:
+            line = lines[index].strip()
+            if not LETTER_RE.search(line) or (index not in edge_rows and len(line) < MIN_BODY_LINE_CHARS):
+                continue
+            key = line_key(normalize_line(line))
+            if key not in self.seen:
+                self.seen.add(key)
+                continue
+            block = self.blocks_by_key.get(key)
+            if block is None:
+                # The first copy went out with its chunk already, so this copy becomes the block text.
+                block = Block(self.block_id_for(key), line)
+                self.blocks[block.block_id] = block
+                self.blocks_by_key[key] = block
+                new_blocks.append(block)
+            block.occurrences += 1
+            self.occurrences.append((block, line))
+            placeholder = f"[[{block.block_id}]]"
+            lines[index] = placeholder
+            self.saved_chars += len(line) - len(placeholder)
+            self.saved_tokens += estimate_tokens(line) - estimate_tokens(placeholder)
+        return '\n'.join(lines), new_blocks
+
+    def take(self, chunk):
+        # Chunks come out in document order, so the next placeholders in the
+        # document are exactly the ones in this chunk.
+        count = len(placeholder_ids(chunk))
+        occurrences = self.occurrences[self.taken:self.taken + count]
+        self.taken += count
+        return occurrences
+
+    def expand(self, chunk, occurrences):
+        # The chunk with every placeholder replaced by the line it stands for.
+        lines = iter(occurrences)
+        return PLACEHOLDER_RE.sub(lambda match: next(lines, (None, match.group(0)))[1], chunk)
+
+    def splice(self, translation, occurrences, block_translation):
+        # block_translation(block) returns the translated block, or None to fall back to the source line.
+        # The n-th placeholder of a block in the translation stands for the n-th copy in the source chunk.
+        lines = {}
+        for block, line in occurrences:
+            lines.setdefault(block.block_id, deque()).append(line)
+
+        def replace(match):
+            queue = lines.get(match.group(1))
+            if not queue:
+                return match.group(0)
+            line = queue.popleft()
+            block = self.blocks[match.group(1)]
+            translated = block_translation(block)
+            if translated is None:
+                return line
+            # "Page 3 of 10" is translated once; every other page gets its own numbers back.
+            numbers = NUMBER_RE.findall(line)
+            if numbers == block.numbers:
+                return translated
+            # Numbers are matched by value, so a translation may reorder them ("10ページ中2ページ"). If they
+            # were spelled out, merged or repeated, there is no safe mapping and the copy stays untranslated.
+            mapping = dict(zip(block.numbers, numbers))
+            if (len(numbers) != len(block.numbers) or len(mapping) != len(block.numbers)
+                    or sorted(NUMBER_RE.findall(translated)) != sorted(block.numbers)):
+                return line
+            return NUMBER_RE.sub(lambda match: mapping[match.group(0)], translated)
+
+        return PLACEHOLDER_RE.sub(replace, translation)
+
+    def summary(self):
+        copies = sum(block.occurrences - 1 for block in self.blocks.values())
+        return (f"Deduplicated {len(self.blocks)} repeated header/footer/boilerplate line(s) in {copies} places: "
+                f"saved {self.saved_chars} characters (~{self.saved_tokens} tokens) per language")
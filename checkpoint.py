@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path_for(output_path):
+    return output_path + '.checkpoint'
+
+
+def source_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return {'source': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_checkpoint_header(path):
+    try:
+        with open(path, 'rb') as file:
+            header = json.loads(file.readline() or b'null')
+    except (OSError, ValueError):
+        return None
+    return header if isinstance(header, dict) else None
+
+
+def chunk_digest(chunk):
+    return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path, header):
+        self.path = path
+        self.header = dict(header, version=CHECKPOINT_VERSION)
+        self.completed = {}
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if not self.completed and self._file.tell() == 0:
+            self._write_line(self.header)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb+') as file:
+                header = json.loads(file.readline() or b'null')
+                if header != self.header:
+                    raise ValueError("checkpoint belongs to a different job")
+                valid_end = file.tell()
+                for line in iter(file.readline, b''):
+                    try:
+                        entry = json.loads(line)
+                        self.completed[entry['index']] = (entry['digest'], entry['translation'])
+                    except ValueError:
+                        break
+                    valid_end = file.tell()
+                # A crash can leave the last line half-written; drop it so new entries start on a clean line.
+                file.truncate(valid_end)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.completed = {}
+            os.remove(self.path)
+
+    def _write_line(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def get(self, index, chunk):
+        entry = self.completed.get(index)
+        if entry is not None and entry[0] == chunk_digest(chunk):
+            return entry[1]
+        return None
+
+    def record(self, index, chunk, translation):
+        digest = chunk_digest(chunk)
+        with self._lock:
+            self._write_line({'index': index, 'digest': digest, 'translation': translation})
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,277 @@
+import re
+import statistics
+import threading
+import zlib
+
+DEFAULT_TOKEN_BUDGET = 1200
+MIN_TOKEN_BUDGET = 100
+TARGET_REQUEST_SECONDS = 60
+THROUGHPUT_SAMPLES = 3
+
+# Full-width stops end a sentence even without a following space, as CJK text has none.
+SEGMENT_RE = re.compile(r'.*?(?:[.!?]+[\"\'”’)\]]*(?:\s+|$)|[。！？]+[\"\'”’)\]」』）]*\s*|\n[ \t]*\n\s*|$)', re.S)
+PARAGRAPH_BREAK_RE = re.compile(r'\n[ \t]*\n')
+# Where SEGMENT_RE can end a segment before the end of the text; the characters
+# those endings are made of can still turn into one when more text arrives.
+BOUNDARY_RE = re.compile(r'[.!?]+[\"\'”’)\]]*\s|[。！？]|\n[ \t]*\n')
+BOUNDARY_CHARS = frozenset('.!?。！？"\'”’)]」』）')
+WORD_RE = re.compile(r'\S+\s*|\s+')
+WIDE_CHAR_RE = re.compile(r'[\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+# Sentence boundaries whose CRC matches this mask are treated like paragraph ends,
+# so chunk boundaries depend on nearby content rather than on everything before it.
+ANCHOR_MASK = 0x7
+
+
+def estimate_tokens(text):
+    wide_chars = sum(1 for _ in WIDE_CHAR_RE.finditer(text))
+    return wide_chars + (len(text) - wide_chars + 3) // 4
+
+
+def token_budget_for_model(model):
+    match = re.search(r'(\d+(?:\.\d+)?)b\b', model.lower()) if model else None
+    if match:
+        size = float(match.group(1))
+        if size <= 3:
+            return 500
+        if size >= 30:
+            return 2000
+    return DEFAULT_TOKEN_BUDGET
+
+
+def token_ceiling_for_context(context_length, prompt_tokens):
+    # The prompt, the chunk and its translation (about as long again) all share the context window.
+    return max(MIN_TOKEN_BUDGET, (context_length - prompt_tokens) // 2)
+
+
+class AdaptiveTokenBudget:
+    # After the first few responses, value is the chunk size at which a request
+    # takes about target_seconds at the measured speed, never above the context
+    # window ceiling. Chunk boundaries must not depend on timing, as the cache and
+    # checkpoints are keyed by chunk text, so documents are chunked at step, which
+    # only follows value between documents and in steps of a factor of two.
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, initial, ceiling=None, target_seconds=TARGET_REQUEST_SECONDS, window=8):
+        self.ceiling = max(MIN_TOKEN_BUDGET, ceiling or initial)
+        self.value = max(MIN_TOKEN_BUDGET, min(initial, self.ceiling))
+        self.step = self.base = self.value
+        self.target_seconds = target_seconds
+        self.window = window
+        self.samples = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, key, initial, ceiling=None):
+        # One budget per endpoint and model for the whole process, so what one document measured sizes the next.
+        with cls._shared_lock:
+            budget = cls._shared.get((key, initial, ceiling))
+            if budget is None:
+                budget = cls._shared[(key, initial, ceiling)] = cls(initial, ceiling)
+            return budget
+
+    def record(self, chunk_tokens, latency, eval_count, eval_seconds):
+        if not chunk_tokens or not eval_count or not eval_seconds:
+            return
+        with self._lock:
+            self.samples = (self.samples + [(chunk_tokens, latency, eval_count, eval_seconds)])[-self.window:]
+            if len(self.samples) < THROUGHPUT_SAMPLES:
+                return
+            tokens_per_second = statistics.median(sample[2] / sample[3] for sample in self.samples)
+            output_ratio = statistics.median(sample[2] / sample[0] for sample in self.samples)
+            # Whatever is not generation (queueing, prompt evaluation) is assumed not to grow with the chunk.
+            overhead = statistics.median(max(0.0, sample[1] - sample[3]) for sample in self.samples)
+            generation_seconds = max(1.0, self.target_seconds - overhead)
+            budget = int(generation_seconds * tokens_per_second / output_ratio)
+            self.value = max(MIN_TOKEN_BUDGET, min(self.ceiling, budget))
+
+    def shrink(self):
+        # Half the current step at most, however many chunks of a document time
+        # out at once; the next document shrinks it again if it still stalls.
+        with self._lock:
+            self.value = max(MIN_TOKEN_BUDGET, min(self.value, self.step // 2))
+            # Older samples describe chunks that were too big; start measuring again.
+            self.samples = []
+        return self.value
+
+    def next_step(self):
+        # The chunk size for the next document. Moving down takes a value below
+        # 3/4 of the step and moving up a value of twice the step, so noise
+        # around a step does not make consecutive runs chunk differently.
+        with self._lock:
+            if self.value < self.step * 3 // 4 or self.value >= self.step * 2:
+                step = self.base
+                while step * 2 <= self.value:
+                    step *= 2
+                while step > self.value and step > MIN_TOKEN_BUDGET:
+                    step //= 2
+                self.step = max(MIN_TOKEN_BUDGET, min(self.ceiling, step))
+            return self.step
+
+
+def iter_segments(text):
+    for match in SEGMENT_RE.finditer(text):
+        segment = match.group(0)
+        if segment:
+            yield segment, PARAGRAPH_BREAK_RE.search(segment) is not None
+
+
+def split_oversized(segment, max_tokens):
+    return split_words(segment, max_tokens)[0]
+
+
+def chop_word(word, max_tokens):
+    # Greedy, so the pieces of a word's beginning are also the first pieces of the whole word.
+    pieces = []
+    start = wide = narrow = 0
+    for index, char in enumerate(word):
+        is_wide = WIDE_CHAR_RE.match(char) is not None
+        if index > start and wide + is_wide + (narrow + (not is_wide) + 3) // 4 > max_tokens:
+            pieces.append(word[start:index])
+            start = index
+            wide = narrow = 0
+        wide += is_wide
+        narrow += not is_wide
+    pieces.append(word[start:])
+    return pieces
+
+
+def split_words(segment, max_tokens, in_long_word=False, complete=True):
+    # Returns (pieces, rest, in_long_word). With complete=False the last word may
+    # still grow, so it and the words collecting with it come back as rest, to be
+    # split again with whatever follows; in_long_word then says rest is the end
+    # of a word too long for one piece. The pieces returned never change.
+    pieces = []
+    current = []
+    current_tokens = 0
+    matches = list(WORD_RE.finditer(segment))
+    for index, match in enumerate(matches):
+        word = match.group(0)
+        open_word = not complete and index == len(matches) - 1
+        word_tokens = estimate_tokens(word)
+        if word_tokens > max_tokens or (index == 0 and in_long_word):
+            if current:
+                pieces.append(''.join(current))
+                current = []
+                current_tokens = 0
+            chopped = chop_word(word, max_tokens)
+            if open_word:
+                return pieces + chopped[:-1], chopped[-1], True
+            pieces.extend(chopped)
+            continue
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(''.join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if complete:
+        return pieces + [''.join(current)] if current else pieces, '', False
+    return pieces, ''.join(current), False
+
+
+def chunk_text(text, max_tokens=DEFAULT_TOKEN_BUDGET):
+    return list(iter_chunks(text, max_tokens))
+
+
+def iter_chunks(text, max_tokens=DEFAULT_TOKEN_BUDGET):
+    return iter_segment_chunks(iter_segments(text), max_tokens)
+
+
+def iter_segment_chunks(segments, max_tokens=DEFAULT_TOKEN_BUDGET):
+    max_tokens = max(1, max_tokens)
+    min_tokens = max_tokens * 3 // 4
+    current = []
+    current_tokens = 0
+
+    for segment, ends_paragraph in segments:
+        if ends_paragraph is None:
+            # Already split out of an oversized segment: a chunk of its own.
+            if current:
+                yield ''.join(current)
+                current = []
+                current_tokens = 0
+            yield segment
+            continue
+        segment_tokens = estimate_tokens(segment)
+        if current and current_tokens + segment_tokens > max_tokens:
+            yield ''.join(current)
+            current = []
+            current_tokens = 0
+
+        if not current and segment_tokens > max_tokens:
+            yield from split_oversized(segment, max_tokens)
+            continue
+
+        current.append(segment)
+        current_tokens += segment_tokens
+
+        is_anchor = ends_paragraph or (zlib.crc32(segment.encode('utf-8')) & ANCHOR_MASK) == 0
+        if current_tokens >= min_tokens and is_anchor:
+            yield ''.join(current)
+            current = []
+            current_tokens = 0
+
+    if current:
+        yield ''.join(current)
+
+
+def iter_stream_segments(pieces, max_tokens=None):
+    # A page often ends mid-sentence, and even a finished sentence may still
+    # gain whitespace or a paragraph break from the next page. So a segment is
+    # only passed on once text after it has arrived; the rest waits in the buffer.
+    # A segment that outgrows max_tokens (tables, forms, OCR output without any
+    # punctuation) is passed on in the pieces split_oversized cuts it into,
+    # marked with ends_paragraph None, so the buffer stays bounded.
+    buffer = ''
+    scanned = 0
+    oversized = in_long_word = False
+
+    def finish(segment):
+        nonlocal oversized, in_long_word
+        if not oversized:
+            return [(segment, PARAGRAPH_BREAK_RE.search(segment) is not None)]
+        split, _, _ = split_words(segment, max_tokens, in_long_word)
+        oversized = in_long_word = False
+        return [(piece, None) for piece in split]
+
+    for piece in pieces:
+        buffer += piece
+        if BOUNDARY_RE.search(buffer, scanned):
+            consumed = 0
+            for match in SEGMENT_RE.finditer(buffer):
+                # `$` also matches before a final newline, so a segment ending there is not final either.
+                if match.end() >= len(buffer) - 1:
+                    break
+                if match.group(0):
+                    yield from finish(match.group(0))
+                consumed = match.end()
+            buffer = buffer[consumed:]
+            scanned = 0
+            continue
+        # No segment ends before the trailing punctuation and whitespace, which
+        # the next piece may still turn into an ending; the next search starts there.
+        tail = len(buffer)
+        while tail > scanned and (buffer[tail - 1] in BOUNDARY_CHARS or buffer[tail - 1].isspace()):
+            tail -= 1
+        scanned = tail
+        # The segment goes on at least until the tail, so once that much is over budget it is oversized.
+        if max_tokens is not None and (oversized or estimate_tokens(buffer[:tail]) > max_tokens):
+            oversized = True
+            split, rest, in_long_word = split_words(buffer[:tail], max_tokens, in_long_word, complete=False)
+            for done in split:
+                yield done, None
+            emitted = tail - len(rest)
+            buffer = buffer[emitted:]
+            scanned -= emitted
+    segments = iter_segments(buffer)
+    first = next(segments, None)
+    if first is not None:
+        yield from finish(first[0])
+    yield from segments
+
+
+def iter_stream_chunks(pieces, max_tokens=DEFAULT_TOKEN_BUDGET):
+    # Same chunks as chunk_text(''.join(pieces)), produced while pieces arrive.
+    return iter_segment_chunks(iter_stream_segments(pieces, max_tokens), max_tokens)
@@ -0,0 +1,158 @@
+import argparse
+import glob
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def find_pdfs(patterns, recursive=False):
+    found = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            search = os.path.join(pattern, '**', '*.pdf') if recursive else os.path.join(pattern, '*.pdf')
+            matches = sorted(glob.glob(search, recursive=recursive))
+        else:
+            matches = sorted(glob.glob(pattern, recursive=recursive)) or [pattern]
+        for path in matches:
+            if path.lower().endswith('.pdf') and os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                found.append(path)
+    return found
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Translate PDF files with a local Ollama model without starting the GUI.")
+    parser.add_argument('paths', nargs='+', help="PDF files, directories or glob patterns")
+    parser.add_argument('-m', '--model', required=True, help="Ollama model name (e.g. llama2, mistral, gemma3:1b)")
+    parser.add_argument('-l', '--language', dest='languages', action='append', required=True,
+                        help="Target language; repeat for several languages")
+    parser.add_argument('-c', '--concurrency', type=int, default=1,
+                        help="Chunks sent to Ollama at once, shared by all files (default: 1)")
+    parser.add_argument('--ollama-url', dest='ollama_urls', action='append',
+                        help="Ollama server as URL[=max parallel requests]; repeat to spread chunks over several servers "
+                             "(default: $OLLAMA_ENDPOINTS or http://localhost:11434)")
+    parser.add_argument('-j', '--jobs', type=int, default=2, help="Files processed at the same time (default: 2)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Search directories recursively")
+    parser.add_argument('--max-tokens', type=int, help="Fixed token budget per chunk (default: sized from the model's context window and measured speed)")
+    parser.add_argument('--extraction-workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes used for PDF text extraction")
+    parser.add_argument('--pack', action='store_true',
+                        help="Cut the text into small segments and send several per request (for slide decks and forms)")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Translate repeated headers, footers and disclaimers on every page instead of once")
+    parser.add_argument('--skip-existing', action='store_true', help="Skip files whose output already exists")
+    parser.add_argument('--no-resume', action='store_true', help="Ignore existing checkpoints and start every file from scratch")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the translation cache")
+    parser.add_argument('--clear-cache', action='store_true', help="Empty the translation cache before starting")
+    parser.add_argument('--trace', help="Append a JSON line per timed stage (extraction, queue wait, first token, ...) to this file")
+    parser.add_argument('--metrics', help="Write a Prometheus text snapshot of stage timings and counters to this file")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print completed files and errors")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pdf_files = find_pdfs(args.paths, args.recursive)
+    if not pdf_files:
+        print("No PDF files found.", file=sys.stderr)
+        return 1
+
+    # Imported only once there is work to do, so --help and usage errors return immediately.
+    from endpoint_pool import create_client
+    from metrics import Metrics
+    from translation_cache import TranslationCache
+    from translator import Translator, output_path_for
+
+    cache = None
+    if not args.no_cache:
+        cache = TranslationCache()
+        if args.clear_cache:
+            cache.clear()
+
+    print_lock = threading.Lock()
+
+    def log(message, always=False):
+        if always or not args.quiet:
+            with print_lock:
+                print(message, flush=True)
+
+    target_languages = list(dict.fromkeys(language.strip().lower() for language in args.languages if language.strip()))
+    jobs = []
+    for file_path in pdf_files:
+        languages = []
+        for target_language in target_languages:
+            if args.skip_existing and os.path.exists(output_path_for(file_path, target_language)):
+                log(f"Skipping {file_path} ({target_language}): output already exists")
+                continue
+            languages.append(target_language)
+        if languages:
+            jobs.append((file_path, languages))
+
+    chunk_executor = ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+    client = create_client(args.ollama_urls, pool_size=max(16, args.concurrency))
+    metrics = Metrics(args.trace)
+
+    def run_job(file_path, languages):
+        prefix = f"[{os.path.basename(file_path)}]"
+        translator = Translator(
+            None, args.model, languages, file_path,
+            max_tokens=args.max_tokens,
+            concurrency=args.concurrency,
+            cache=cache,
+            extraction_workers=args.extraction_workers,
+            resume=not args.no_resume,
+            client=client,
+            pack=args.pack,
+            dedup=not args.no_dedup,
+            metrics=metrics,
+            chunk_start=lambda message: None,
+            chunk_complete=lambda message: log(f"{prefix} {message}"),
+        )
+        output_files = translator.run(executor=chunk_executor)
+        failed_chunks = {language: sorted(chunks) for language, chunks in translator.failed_chunks.items() if chunks}
+        return output_files, failed_chunks
+
+    failures = 0
+    completed = 0
+    total = sum(len(languages) for _, languages in jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as job_executor:
+            futures = {job_executor.submit(run_job, file_path, languages): (file_path, languages)
+                       for file_path, languages in jobs}
+            for future in as_completed(futures):
+                file_path, languages = futures[future]
+                try:
+                    output_files, failed_chunks = future.result()
+                    for language, output_file in output_files.items():
+                        if language in failed_chunks:
+                            continue
+                        completed += 1
+                        log(f"Translated {file_path} -> {output_file}", always=True)
+                    # A file with any failed chunk is a failure, even if the rest of it was written.
+                    for language, chunks in failed_chunks.items():
+                        failures += 1
+                        if language in output_files:
+                            log(f"Incomplete: {file_path} -> {output_files[language]}: {len(chunks)} chunk(s) failed "
+                                f"({', '.join(str(chunk) for chunk in chunks)}); run again to retry them", always=True)
+                        else:
+                            log(f"Error translating {file_path} to {language}: all {len(chunks)} chunks failed", always=True)
+                except Exception as e:
+                    failures += 1
+                    log(f"Error translating {file_path} to {', '.join(languages)}: {str(e)}", always=True)
+                if args.metrics:
+                    metrics.write_prometheus(args.metrics)
+    finally:
+        chunk_executor.shutdown()
+        client.close()
+        metrics.close()
+        if cache is not None:
+            cache.close()
+
+    log(f"{completed}/{total} translations completed" + (f", {failures} with errors" if failures else ""), always=True)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
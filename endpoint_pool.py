@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+
+import requests
+
+from ollama_client import DEFAULT_BASE_URL, DEFAULT_KEEP_ALIVE, OllamaClient, OllamaError
+
+DEFAULT_ENDPOINT_CONCURRENCY = 4
+ENDPOINT_ERRORS = (requests.exceptions.RequestException, OllamaError, ValueError)
+
+
+class Endpoint:
+    def __init__(self, base_url, max_concurrency, pool_size=16):
+        self.client = OllamaClient(base_url, pool_size=max(pool_size, max_concurrency))
+        self.base_url = self.client.base_url
+        self.max_concurrency = max(1, max_concurrency)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_until = None
+
+    def is_ejected(self):
+        return self.ejected_until is not None
+
+
+class EndpointPool:
+    # Spreads chat requests over several Ollama servers. It offers the same
+    # methods as OllamaClient, so the translator does not need to know whether
+    # it talks to one server or many.
+    def __init__(self, endpoints, pool_size=16, eject_seconds=30):
+        if not endpoints:
+            raise ValueError("At least one Ollama endpoint is required")
+        self.endpoints = [Endpoint(base_url, max_concurrency, pool_size) for base_url, max_concurrency in endpoints]
+        self.base_url = ', '.join(endpoint.base_url for endpoint in self.endpoints)
+        self.eject_seconds = eject_seconds
+        self._condition = threading.Condition()
+
+    def eject(self, endpoint):
+        with self._condition:
+            endpoint.failures += 1
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            self._condition.notify_all()
+
+    def revive(self):
+        # An ejected server gets traffic again only once its cool-down is over
+        # and /api/tags answers.
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if endpoint.is_ejected() and endpoint.ejected_until <= now:
+                try:
+                    endpoint.client.available_models(refresh=True)
+                except ENDPOINT_ERRORS:
+                    self.eject(endpoint)
+                    continue
+                with self._condition:
+                    endpoint.ejected_until = None
+                    self._condition.notify_all()
+
+    def serving_endpoints(self, model, refresh=False):
+        self.revive()
+        serving = []
+        for endpoint in self.endpoints:
+            if endpoint.is_ejected():
+                continue
+            try:
+                if model in endpoint.client.available_models(refresh=refresh):
+                    serving.append(endpoint)
+            except ENDPOINT_ERRORS:
+                self.eject(endpoint)
+        return serving
+
+    def list_models(self, timeout=5):
+        return self.available_models(refresh=True)
+
+    def available_models(self, refresh=False):
+        self.revive()
+        model_names = []
+        last_error = None
+        for endpoint in self.endpoints:
+            if endpoint.is_ejected():
+                continue
+            try:
+                model_names.extend(name for name in endpoint.client.available_models(refresh=refresh)
+                                   if name not in model_names)
+            except ENDPOINT_ERRORS as e:
+                last_error = e
+                self.eject(endpoint)
+        if not model_names and last_error is not None:
+            raise last_error
+        if not model_names and all(endpoint.is_ejected() for endpoint in self.endpoints):
+            raise requests.exceptions.ConnectionError(f"No Ollama endpoint is reachable ({self.base_url})")
+        return model_names
+
+    def has_model(self, model):
+        if self.serving_endpoints(model):
+            return True
+        return bool(self.serving_endpoints(model, refresh=True))
+
+    def context_length(self, model):
+        # Chunks are shared by all endpoints, so they must fit the smallest window.
+        lengths = []
+        last_error = None
+        for endpoint in self.serving_endpoints(model):
+            try:
+                lengths.append(endpoint.client.context_length(model))
+            except ENDPOINT_ERRORS as e:
+                last_error = e
+        if not lengths:
+            raise last_error or OllamaError(503, f"No healthy Ollama endpoint serves model '{model}' ({self.base_url})")
+        return min(lengths)
+
+    def is_ready(self, model):
+        serving = self.serving_endpoints(model)
+        return bool(serving) and all(endpoint.client.is_ready(model) for endpoint in serving)
+
+    def ensure_ready(self, model, keep_alive=DEFAULT_KEEP_ALIVE):
+        loaded = False
+        last_error = None
+        for endpoint in self.serving_endpoints(model):
+            try:
+                loaded = endpoint.client.ensure_ready(model, keep_alive) or loaded
+            except ENDPOINT_ERRORS as e:
+                last_error = e
+                self.eject(endpoint)
+        if last_error is not None and not self.serving_endpoints(model):
+            raise last_error
+        return loaded
+
+    def preload(self, model, keep_alive=DEFAULT_KEEP_ALIVE):
+        # Loads the model on every serving endpoint, even ones already marked ready.
+        last_error = None
+        loaded = False
+        for endpoint in self.serving_endpoints(model):
+            try:
+                endpoint.client.preload(model, keep_alive)
+                loaded = True
+            except ENDPOINT_ERRORS as e:
+                last_error = e
+                self.eject(endpoint)
+        if not loaded:
+            raise last_error or OllamaError(503, f"No healthy Ollama endpoint serves model '{model}' ({self.base_url})")
+
+    def acquire(self, serving):
+        # Least outstanding requests relative to the endpoint's limit wins;
+        # when every endpoint is full, wait for one of them to free a slot.
+        with self._condition:
+            while True:
+                candidates = [endpoint for endpoint in serving if not endpoint.is_ejected()]
+                if not candidates:
+                    return None
+                free = [endpoint for endpoint in candidates if endpoint.outstanding < endpoint.max_concurrency]
+                if free:
+                    endpoint = min(free, key=lambda e: (e.outstanding / e.max_concurrency, e.requests))
+                    endpoint.outstanding += 1
+                    endpoint.requests += 1
+                    return endpoint
+                self._condition.wait()
+
+    def release(self, endpoint):
+        with self._condition:
+            endpoint.outstanding -= 1
+            self._condition.notify_all()
+
+    def chat(self, model, messages, **kwargs):
+        tried = set()
+        last_error = None
+        while True:
+            serving = [endpoint for endpoint in self.serving_endpoints(model) if endpoint not in tried]
+            endpoint = self.acquire(serving)
+            if endpoint is None:
+                if last_error is not None:
+                    raise last_error
+                raise OllamaError(503, f"No healthy Ollama endpoint serves model '{model}' ({self.base_url})")
+            try:
+                return endpoint.client.chat(model, messages, **kwargs)
+            except requests.exceptions.ReadTimeout:
+                # Generation stalled mid-chunk: the server is up but this chunk is too slow.
+                # That is the translator's cue to split it, not a reason to take the server out.
+                raise
+            except requests.exceptions.ConnectionError as e:
+                # Includes ConnectTimeout, and NoResponseError for a server that accepts requests but never answers.
+                last_error = e
+                self.eject(endpoint)
+            except OllamaError as e:
+                if e.status_code == 404:
+                    # The model was removed from this server since its tags were cached.
+                    endpoint.client.available_models(refresh=True)
+                elif e.status_code >= 500:
+                    self.eject(endpoint)
+                else:
+                    raise
+                last_error = e
+            finally:
+                self.release(endpoint)
+            # Each endpoint gets at most one attempt per chunk, so a bad chunk cannot cycle forever.
+            tried.add(endpoint)
+
+    def stats(self):
+        with self._condition:
+            return [{
+                'base_url': endpoint.base_url,
+                'max_concurrency': endpoint.max_concurrency,
+                'requests': endpoint.requests,
+                'failures': endpoint.failures,
+                'ejected': endpoint.is_ejected(),
+            } for endpoint in self.endpoints]
+
+    def summary(self):
+        return ', '.join(
+            f"{stat['base_url']}: {stat['requests']} requests, {stat['failures']} failures"
+            + (" (ejected)" if stat['ejected'] else "")
+            for stat in self.stats()
+        )
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+
+def parse_endpoints(specs, default_concurrency=DEFAULT_ENDPOINT_CONCURRENCY):
+    # "host:port=4" -> ("http://host:port", 4); commas or spaces separate several endpoints.
+    if isinstance(specs, str):
+        specs = [specs]
+    endpoints = []
+    for spec in specs:
+        for item in spec.replace(',', ' ').split():
+            base_url, _, limit = item.partition('=')
+            if '://' not in base_url:
+                base_url = 'http://' + base_url
+            endpoints.append((base_url.rstrip('/'), int(limit) if limit else default_concurrency))
+    return endpoints
+
+
+def create_client(specs=None, pool_size=16):
+    # Falls back to OLLAMA_ENDPOINTS, then to the default local server.
+    endpoints = parse_endpoints(specs or os.environ.get('OLLAMA_ENDPOINTS', ''))
+    if not endpoints:
+        return OllamaClient(DEFAULT_BASE_URL, pool_size=pool_size)
+    if len(endpoints) == 1:
+        return OllamaClient(endpoints[0][0], pool_size=pool_size)
+    return EndpointPool(endpoints, pool_size=pool_size)
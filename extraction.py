@@ -0,0 +1,88 @@
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PAGES_PER_BATCH = 16
+
+_worker_readers = {}
+
+
+def iter_pages(file_path, workers=1, metrics=None):
+    if workers > 1:
+        yield from iter_pages_parallel(file_path, workers, metrics=metrics)
+        return
+    # PyPDF2 is imported on first use: importing the translator (or the GUI) should not pay for it.
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        started = time.perf_counter()
+        reader = PyPDF2.PdfReader(file)
+        total_pages = len(reader.pages)
+        if metrics is not None:
+            metrics.observe('pdf_open', time.perf_counter() - started, document=os.path.basename(file_path), pages=total_pages)
+        for page_number, page in enumerate(reader.pages, 1):
+            started = time.perf_counter()
+            text = page.extract_text() or ''
+            if metrics is not None:
+                metrics.observe('page_extract', time.perf_counter() - started, document=os.path.basename(file_path), page=page_number)
+            yield page_number, total_pages, text
+
+
+def read_text(file_path, workers=1):
+    return '\n'.join(text for _, _, text in iter_pages(file_path, workers))
+
+
+def _open_shared_reader(file_path):
+    # Each worker process maps the file once and keeps its parsed reader, so page
+    # batches only pay for extraction and the bytes are shared via the page cache.
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    reader = _worker_readers.get(key)
+    if reader is None:
+        import PyPDF2
+        _worker_readers.clear()
+        with open(file_path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        reader = PyPDF2.PdfReader(mapped)
+        _worker_readers[key] = reader
+    return reader
+
+
+def _extract_page_range(file_path, start, stop):
+    # Returns (text, seconds) per page; the timings travel back with the text
+    # because the worker process cannot see the parent's metrics.
+    reader = _open_shared_reader(file_path)
+    pages = []
+    for index in range(start, stop):
+        started = time.perf_counter()
+        text = reader.pages[index].extract_text() or ''
+        pages.append((text, time.perf_counter() - started))
+    return pages
+
+
+def iter_pages_parallel(file_path, workers, pages_per_batch=PAGES_PER_BATCH, metrics=None):
+    import PyPDF2
+    started = time.perf_counter()
+    with open(file_path, 'rb') as file:
+        total_pages = len(PyPDF2.PdfReader(file).pages)
+
+    if total_pages < pages_per_batch * 2:
+        yield from iter_pages(file_path, metrics=metrics)
+        return
+    if metrics is not None:
+        metrics.observe('pdf_open', time.perf_counter() - started, document=os.path.basename(file_path), pages=total_pages)
+
+    batches = [(start, min(start + pages_per_batch, total_pages)) for start in range(0, total_pages, pages_per_batch)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            while next_batch < len(batches) and len(pending) < workers * 2:
+                start, stop = batches[next_batch]
+                pending.append((start, executor.submit(_extract_page_range, file_path, start, stop)))
+                next_batch += 1
+            start, future = pending.pop(0)
+            for offset, (text, seconds) in enumerate(future.result()):
+                if metrics is not None:
+                    metrics.observe('page_extract', seconds, document=os.path.basename(file_path), page=start + offset + 1)
+                yield start + offset + 1, total_pages, text
@@ -1,234 +1,147 @@
 import sys
 import os
-import PyPDF2
-import ollama
-import requests
-import json
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton, QLineEdit, QGridLayout, QMessageBox, QProgressBar
-from PyQt5.QtCore import QUrl, QThread, pyqtSignal
-from PyQt5.QtGui import QDesktopServices
+import time
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton, QLineEdit, QGridLayout, QMessageBox, QProgressBar, QSpinBox, QCheckBox, QListWidget, QListWidgetItem
+from PyQt5.QtCore import QUrl, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QDesktopServices, QTextCursor
+
+# Worker signals only fill buffers; the console, status and progress bar are
+# repainted from those buffers at most this often.
+UI_REFRESH_MS = 100
+CONSOLE_MAX_LINES = 5000
+SERVICE_POLL_SECONDS = 0.5
+
+# The translator, HTTP client and PDF backend are imported when the first job
+# starts, not at launch, so the window appears without waiting for them.
 
 class TranslationWorker(QThread):
     progress_update = pyqtSignal(str, int)
     chunk_start = pyqtSignal(str)
     chunk_complete = pyqtSignal(str)
-    finished = pyqtSignal(str)
+    token_stream = pyqtSignal(str)
+    finished = pyqtSignal(dict)
     error = pyqtSignal(str)
+    cancelled = pyqtSignal(str)
     
-    def __init__(self, text, model, target_language, file_path, max_length=5000):
+    def __init__(self, text, model, target_language, file_path, max_tokens=None, concurrency=1, cache=None, extraction_workers=1, client=None, pack=False):
         super().__init__()
-        self.text = text
+        from translator import Translator
+        self.translator = Translator(
+            text, model, target_language, file_path,
+            max_tokens=max_tokens,
+            concurrency=concurrency,
+            cache=cache,
+            extraction_workers=extraction_workers,
+            client=client,
+            pack=pack,
+            progress_update=self.progress_update.emit,
+            chunk_start=self.chunk_start.emit,
+            chunk_complete=self.chunk_complete.emit,
+            token_update=self.token_stream.emit,
+        )
+    
+    def cancel(self):
+        self.translator.cancel()
+    
+    def run(self):
+        from translator import TranslationCancelled, TranslationError
+        try:
+            output_paths = self.translator.run()
+        except TranslationCancelled as e:
+            self.cancelled.emit(str(e))
+            return
+        except TranslationError as e:
+            self.error.emit(str(e))
+            return
+        self.finished.emit(output_paths)
+
+class ServiceJobWorker(QThread):
+    # Same signals as TranslationWorker, but the job runs in `python service.py`
+    # and this thread only submits it and polls its status.
+    progress_update = pyqtSignal(str, int)
+    chunk_start = pyqtSignal(str)
+    chunk_complete = pyqtSignal(str)
+    token_stream = pyqtSignal(str)
+    finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal(str)
+    
+    def __init__(self, service_url, model, target_languages, file_path, pack=False, cache=True):
+        super().__init__()
+        from service_client import ServiceClient
+        self.client = ServiceClient(service_url)
         self.model = model
-        self.target_language = target_language
+        self.target_languages = target_languages
         self.file_path = file_path
-        self.max_length = max_length
+        self.pack = pack
+        self.cache = cache
+        self.cancel_requested = False
+    
+    def cancel(self):
+        # Picked up by the polling loop, so the UI thread never waits on the service.
+        self.cancel_requested = True
     
     def run(self):
+        from service_client import ServiceError
         try:
-            self.chunk_start.emit("Checking if Ollama is running...")
-            try:
-                health_response = requests.get("http://localhost:11434/api/tags", timeout=5)
-                if health_response.status_code != 200:
-                    self.error.emit(f"Ollama health check failed. Status: {health_response.status_code}\nMake sure Ollama is running on http://localhost:11434")
+            job = self.client.submit(self.file_path, self.model, self.target_languages, pack=self.pack, cache=self.cache)
+            self.chunk_complete.emit(f"Submitted to translation service at {self.client.url} as job {job['id']}")
+            log_next = 0
+            cancel_sent = False
+            while True:
+                if self.cancel_requested and not cancel_sent:
+                    self.client.cancel(job['id'])
+                    cancel_sent = True
+                status = self.client.status(job['id'], since=log_next)
+                for message in status['log']:
+                    self.chunk_complete.emit(message)
+                log_next = status['log_next']
+                if status['status'] == 'done':
+                    self.finished.emit(status['outputs'])
                     return
-                
-                models_data = health_response.json()
-                model_names = [model.get('name', '') for model in models_data.get('models', [])]
-                if self.model not in model_names:
-                    self.error.emit(f"Model '{self.model}' not found in Ollama.\nAvailable models: {', '.join(model_names) if model_names else 'none'}\n\nUse 'ollama pull {self.model}' to download the model.")
+                if status['status'] == 'failed':
+                    self.error.emit(status['error'] or "Translation failed")
                     return
-                    
-            except requests.exceptions.Timeout:
-                self.error.emit("Timeout connecting to Ollama. Make sure Ollama is running and responding.")
-                return
-            except requests.exceptions.ConnectionError:
-                self.error.emit("Cannot connect to Ollama at http://localhost:11434\nMake sure Ollama is running.")
-                return
-            except requests.exceptions.RequestException as e:
-                self.error.emit(f"Error checking Ollama: {str(e)}\nMake sure Ollama is running on http://localhost:11434")
-                return
-            except Exception as e:
-                self.error.emit(f"Error verifying Ollama: {str(e)}")
-                return
-            
-            self.chunk_complete.emit("Ollama connection verified, model found")
-            
-            self.chunk_start.emit("Testing model response (this may take a moment if model needs to load)...")
-            try:
-                test_payload = {
-                    "model": self.model,
-                    "messages": [{"role": "user", "content": "Say 'test'"}],
-                    "stream": False
-                }
-                test_response = requests.post(
-                    "http://localhost:11434/api/chat",
-                    json=test_payload,
-                    timeout=(10, 300)
-                )
-                if test_response.status_code == 200:
-                    response_data = test_response.json()
-                    self.chunk_complete.emit("Model is ready and responding")
-                else:
-                    curl_cmd = f"curl http://localhost:11434/api/generate -d '{{\"model\":\"{self.model}\",\"prompt\":\"test\"}}'"
-                    self.error.emit(f"Model test failed: Status {test_response.status_code}\nResponse: {test_response.text[:200]}\n\nTry testing Ollama manually: {curl_cmd}")
-                    return
-            except requests.exceptions.Timeout as e:
-                self.error.emit(f"Model test timed out after 5 minutes.\nThe model '{self.model}' might be:\n- Still loading into GPU memory\n- Too large for your system\n- Not compatible\n\nError: {str(e)}\n\nTry testing manually: ollama run {self.model}")
-                return
-            except requests.exceptions.ConnectionError as e:
-                self.error.emit(f"Connection error during model test: {str(e)}\nMake sure Ollama is running.")
-                return
-            except Exception as e:
-                self.error.emit(f"Model test error: {str(e)}\n\nTry testing manually: ollama run {self.model}")
-                return
-            
-            translated_text = ''
-            total_chunks = (len(self.text) + self.max_length - 1) // self.max_length
-            
-            for chunk_idx, start in enumerate(range(0, len(self.text), self.max_length), 1):
-                end = min(start + self.max_length, len(self.text))
-                chunk = self.text[start:end]
-                
-                progress_percent = int((chunk_idx / total_chunks) * 100)
-                self.progress_update.emit(f"Translating chunk {chunk_idx}/{total_chunks}...", progress_percent)
-                self.chunk_start.emit(f"Translating chunk {chunk_idx}/{total_chunks}...")
-                
-                try:
-                    self.chunk_start.emit(f"Sending request to Ollama for chunk {chunk_idx}/{total_chunks}...")
-                    
-                    ollama_url = "http://localhost:11434/api/chat"
-                    target_lang = self.target_language.strip().lower()
-                    target_lang_capitalized = target_lang.capitalize()
-                    
-                    language_map = {
-                        'spanish': 'español',
-                        'italian': 'italiano',
-                        'german': 'deutsch',
-                        'french': 'français',
-                        'portuguese': 'português',
-                        'dutch': 'nederlands',
-                        'russian': 'русский',
-                        'chinese': '中文',
-                        'japanese': '日本語',
-                        'korean': '한국어',
-                        'arabic': 'العربية',
-                        'polish': 'polski',
-                        'greek': 'ελληνικά',
-                        'turkish': 'türkçe',
-                    }
-                    
-                    target_lang_native = language_map.get(target_lang, target_lang_capitalized)
-                    
-                    payload = {
-                        "model": self.model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": f"CRITICAL INSTRUCTION: You are a translator. You MUST translate text to {target_lang_capitalized} ({target_lang_native}). Output ONLY in {target_lang_capitalized} ({target_lang_native})."
-                            },
-                            {
-                                "role": "user",
-                                "content": f"Translate this text from its original language to {target_lang_capitalized} ({target_lang_native}) ONLY. Output the translation ONLY in {target_lang_capitalized} ({target_lang_native}):\n\n{chunk}"
-                            }
-                        ],
-                        "stream": False
-                    }
-                    
-                    timeout_seconds = 180
-                    
-                    self.chunk_start.emit(f"Translating to {target_lang_capitalized} ({target_lang_native})")
-                    
-                    headers = {'Content-Type': 'application/json'}
-                    try:
-                        http_response = requests.post(
-                            ollama_url,
-                            json=payload,
-                            headers=headers,
-                            timeout=(10, timeout_seconds)
-                        )
-                    except requests.exceptions.Timeout as e:
-                        self.error.emit(f"Request timed out after {timeout_seconds} seconds for chunk {chunk_idx}.\nThis might mean:\n- The model is still loading\n- The request is too large\n- Ollama is not responding\n\nError: {str(e)}")
-                        return
-                    except requests.exceptions.ConnectionError as e:
-                        self.error.emit(f"Connection error for chunk {chunk_idx}: {str(e)}\nMake sure Ollama is still running.")
-                        return
-                    
-                    if http_response.status_code != 200:
-                        error_text = http_response.text[:200] if http_response.text else "No error details"
-                        self.error.emit(f"Ollama API error for chunk {chunk_idx}: Status {http_response.status_code}\nResponse: {error_text}\n\nCheck Ollama logs for more details.")
-                        return
-                    
-                    response = http_response.json()
-                    self.chunk_start.emit(f"Received response from Ollama for chunk {chunk_idx}/{total_chunks}")
-                    
-                    if response and 'message' in response and 'content' in response['message']:
-                        content = response['message']['content'].strip()
-                        
-                        prefixes_to_remove = [
-                            f"translation:",
-                            f"in {target_lang_capitalized.lower()}:",
-                            f"{target_lang_capitalized.lower()}:",
-                            f"{target_lang_capitalized}:",
-                            "translation to",
-                            "translated:",
-                            "here's the translation:",
-                            "here is the translation:",
-                        ]
-                        
-                        content_lower = content.lower()
-                        for prefix in prefixes_to_remove:
-                            if content_lower.startswith(prefix):
-                                content = content[len(prefix):].strip()
-                                content = content.lstrip(":-\n").strip()
-                                break
-                        
-                        lines = content.split('\n')
-                        cleaned_lines = []
-                        skip_patterns = [
-                            'original:',
-                            'text:',
-                            'source:',
-                        ]
-                        
-                        in_translation = True
-                        for line in lines:
-                            line_lower = line.lower().strip()
-                            if any(pattern in line_lower and ':' in line_lower for pattern in skip_patterns):
-                                in_translation = False
-                                continue
-                            if target_lang_capitalized.lower() in line_lower and ':' in line_lower:
-                                in_translation = True
-                                if ':' in line:
-                                    line = line.split(':', 1)[1].strip()
-                            if in_translation and line.strip():
-                                cleaned_lines.append(line)
-                        
-                        final_content = '\n'.join(cleaned_lines).strip() if cleaned_lines else content.strip()
-                        
-                        if final_content:
-                            translated_text += final_content + '\n\n'
-                            self.chunk_complete.emit(f"Chunk {chunk_idx}/{total_chunks} completed")
-                        else:
-                            self.error.emit(f"Empty or invalid response from Ollama for chunk {chunk_idx}")
-                            return
-                    else:
-                        self.error.emit(f"Unexpected response format from Ollama for chunk {chunk_idx}: {str(response)}")
-                        return
-                except requests.exceptions.Timeout:
-                    self.error.emit(f"Timeout: Ollama did not respond within {timeout_seconds} seconds for chunk {chunk_idx}. The model might still be loading. Try again in a moment.")
+                if status['status'] == 'cancelled':
+                    self.cancelled.emit(status['message'] or "Translation cancelled.")
                     return
-                except requests.exceptions.RequestException as e:
-                    self.error.emit(f"Connection error translating chunk {chunk_idx}: {str(e)}")
-                    return
-                except Exception as e:
-                    self.error.emit(f"Error translating chunk {chunk_idx}: {str(e)}")
-                    return
-            
-            self.progress_update.emit("Saving translated text...", 95)
-            self.finished.emit(translated_text)
-            
-        except Exception as e:
-            self.error.emit(f"Translation error: {str(e)}")
+                self.progress_update.emit(status['message'], status['progress'])
+                time.sleep(SERVICE_POLL_SECONDS)
+        except (OSError, ServiceError, ValueError) as e:
+            self.error.emit(f"Translation service at {self.client.url} failed: {str(e)}")
+
+class TranslationJob(QWidget):
+    # One dropped PDF: a row in the job list with its own status and cancel button.
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+        self.status = 'Queued'
+        self.worker = None
+        self.output_paths = {}
+        self.item = None
+        
+        self.name_label = QLabel(os.path.basename(file_path))
+        self.name_label.setToolTip(file_path)
+        self.status_label = QLabel(self.status)
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setStyleSheet("padding: 2px 10px; min-height: 16px;")
+        
+        layout = QHBoxLayout()
+        layout.setContentsMargins(6, 2, 6, 2)
+        layout.addWidget(self.name_label)
+        layout.addStretch()
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.btn_cancel)
+        self.setLayout(layout)
+    
+    def set_status(self, status, detail=None):
+        self.status = status
+        self.status_label.setText(detail or status)
+        if status in ('Done', 'Failed', 'Cancelled'):
+            self.btn_cancel.setText("Remove")
+            self.btn_cancel.setEnabled(True)
+        elif status == 'Cancelling':
+            self.btn_cancel.setEnabled(False)
 
 class PDFDropWidget(QWidget):
     def __init__(self):
@@ -243,7 +156,7 @@ class PDFDropWidget(QWidget):
                 font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
                 font-size: 13px;
             }
-            QLineEdit, QTextEdit {
+            QLineEdit, QTextEdit, QListWidget {
                 border: 2px solid #e0e0e0;
                 border-radius: 8px;
                 padding: 8px 12px;
@@ -294,19 +207,44 @@ class PDFDropWidget(QWidget):
             }
         """)
         
-        self.text_edit = QTextEdit()
-        self.text_edit.setPlaceholderText("Drag and drop a PDF file here.")
-        self.text_edit.setReadOnly(True)
+        self.jobs = []
+        self.current_job = None
+        self.job_settings = None
+        self.failed_jobs = []
+        self.pending_console = []
+        self.pending_status = None
+        self.pending_progress = None
+        self.streaming_line_active = False
+        
+        self.job_list = QListWidget()
+        self.job_list.setToolTip("Drag and drop PDF files here. They are translated one after another.")
+        self.job_list.setMinimumHeight(90)
         
         self.language_input = QLineEdit()
-        self.language_input.setPlaceholderText("Enter target language (e.g., Spanish, German, etc.)")
+        self.language_input.setPlaceholderText("Enter target language(s), comma separated (e.g., Spanish, German)")
 
         self.model_input = QLineEdit()
         self.model_input.setPlaceholderText("Enter Ollama model name (e.g., llama2, mistral, codellama)")
         
+        self.concurrency_input = QSpinBox()
+        self.concurrency_input.setMinimum(1)
+        self.concurrency_input.setMaximum(16)
+        self.concurrency_input.setValue(1)
+        self.concurrency_input.setToolTip("Number of chunks sent to Ollama at once. Match this to OLLAMA_NUM_PARALLEL.")
+        
         self.btn_translate = QPushButton("Translate Text")
         self.btn_translate.clicked.connect(self.prompt_for_translation)
         
+        self.cache_checkbox = QCheckBox("Use translation cache")
+        self.cache_checkbox.setChecked(True)
+        self.cache_checkbox.setToolTip("Reuse translations of unchanged chunks from previous runs.")
+        
+        self.pack_checkbox = QCheckBox("Pack small segments")
+        self.pack_checkbox.setToolTip("Send many short segments (slides, forms) in one request instead of one request each.")
+        
+        self.btn_clear_cache = QPushButton("Clear Cache")
+        self.btn_clear_cache.clicked.connect(self.clear_translation_cache)
+        
         self.btn_open_file = QPushButton("Open Translated Text File")
         self.btn_open_file.clicked.connect(self.open_translated_file)
         self.btn_open_file.setEnabled(False)
@@ -322,17 +260,25 @@ class PDFDropWidget(QWidget):
 
         self.output_console = QTextEdit()
         self.output_console.setReadOnly(True)
+        self.output_console.document().setMaximumBlockCount(CONSOLE_MAX_LINES)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(UI_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.flush_updates)
+        self.refresh_timer.start()
 
         layout = QGridLayout()
         layout.setSpacing(12)
         layout.setContentsMargins(20, 20, 20, 20)
         
-        layout.addWidget(QLabel("PDF File:"), 0, 0)
-        layout.addWidget(self.text_edit, 0, 1, 1, 2)
+        layout.addWidget(QLabel("PDF Files:"), 0, 0)
+        layout.addWidget(self.job_list, 0, 1, 1, 2)
         layout.addWidget(QLabel("Language:"), 1, 0)
         layout.addWidget(self.language_input, 1, 1, 1, 2)
         layout.addWidget(QLabel("Model:"), 2, 0)
         layout.addWidget(self.model_input, 2, 1, 1, 2)
+        layout.addWidget(QLabel("Parallel requests:"), 3, 0)
+        layout.addWidget(self.concurrency_input, 3, 1)
         layout.addWidget(self.btn_translate, 3, 2)
         layout.addWidget(QLabel("Status:"), 4, 0)
         layout.addWidget(self.status_label, 4, 1, 1, 2)
@@ -340,6 +286,9 @@ class PDFDropWidget(QWidget):
         layout.addWidget(self.output_console, 6, 0, 1, 3)
         
         button_layout = QHBoxLayout()
+        button_layout.addWidget(self.cache_checkbox)
+        button_layout.addWidget(self.btn_clear_cache)
+        button_layout.addWidget(self.pack_checkbox)
         button_layout.addStretch()
         button_layout.addWidget(self.btn_open_file)
         layout.addLayout(button_layout, 7, 0, 1, 3)
@@ -356,134 +305,255 @@ class PDFDropWidget(QWidget):
 
     def dropEvent(self, event):
         urls = event.mimeData().urls()
-        if urls and len(urls) > 0:
-            filepath = str(urls[0].toLocalFile())
-            if filepath.lower().endswith('.pdf'):
-                self.text_edit.setText(filepath)
-                self.file_path = filepath
-                event.accept()
-            else:
-                self.text_edit.setText("Please drop a PDF file.")
-                event.ignore()
-
-    def read_pdf(self, file_path):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ''
-            for page in reader.pages:
-                text += page.extract_text()
-        return text
+        added = 0
+        for url in urls:
+            filepath = str(url.toLocalFile())
+            if not filepath.lower().endswith('.pdf'):
+                self.log(f"Skipped '{os.path.basename(filepath) or url.toString()}': not a PDF file.")
+                continue
+            if any(job.file_path == filepath and job.status in ('Queued', 'Running') for job in self.jobs):
+                continue
+            self.add_job(filepath)
+            added += 1
+        if added:
+            event.accept()
+            # Files dropped while a queue is running join it with the same settings.
+            if self.job_settings is not None:
+                self.start_next_job()
+        else:
+            event.ignore()
+    
+    def add_job(self, file_path):
+        job = TranslationJob(file_path)
+        job.btn_cancel.clicked.connect(lambda _, job=job: self.cancel_job(job))
+        job.item = QListWidgetItem()
+        job.item.setSizeHint(job.sizeHint())
+        self.job_list.addItem(job.item)
+        self.job_list.setItemWidget(job.item, job)
+        self.jobs.append(job)
+    
+    def cancel_job(self, job):
+        if job.status == 'Queued':
+            job.set_status('Cancelled')
+            self.log(f"Removed '{os.path.basename(job.file_path)}' from the queue.")
+        elif job.status == 'Running':
+            # The worker stops at its next token; finished chunks stay in the checkpoint for a later retry.
+            job.set_status('Cancelling', "Cancelling...")
+            job.worker.cancel()
+        elif job.status != 'Cancelling':
+            self.job_list.takeItem(self.job_list.row(job.item))
+            self.jobs.remove(job)
 
     def prompt_for_translation(self):
-        if hasattr(self, 'file_path') and os.path.exists(self.file_path):
-            self.status_label.setText('<span style="color: #333333;">Reading PDF...</span>')
-            QApplication.processEvents()
-            
-            text = self.read_pdf(self.file_path)
-            model = self.model_input.text().strip()
-            target_language = self.language_input.text().strip()
-            
-            if not target_language:
-                self.status_label.setText('<span style="color: #333333;">Ready</span>')
-                self.output_console.append("Please enter a target language.")
-                return
-            
-            if not model:
-                self.status_label.setText('<span style="color: #333333;">Ready</span>')
-                self.output_console.append("Please enter an Ollama model name.")
-                return
-
-            target_lang_normalized = target_language.strip().lower()
-            language_map = {
-                'spanish': 'español',
-                'italian': 'italiano',
-                'german': 'deutsch',
-                'french': 'français',
-                'portuguese': 'português',
-                'dutch': 'nederlands',
-                'chinese': '中文',
-                'japanese': '日本語',
-                'korean': '한국어',
-            }
-            target_lang_native = language_map.get(target_lang_normalized, target_lang_normalized)
-            
-            self.output_console.append(f"Ready to translate PDF using model: {model}")
-            self.output_console.append(f"Target language: {target_lang_normalized.capitalize()} ({target_lang_native})")
-            self.output_console.append(f"PDF text length: {len(text)} characters")
-            
-            self.translate_text(text, model, target_lang_normalized)
-        else:
-            self.status_label.setText('<span style="color: #333333;">Ready</span>')
-            self.output_console.append("Please drop a valid PDF file first.")
+        queued_jobs = [job for job in self.jobs if job.status == 'Queued']
+        if not queued_jobs:
+            self.set_status('Ready')
+            self.log("Please drop one or more PDF files first.")
+            return
+        
+        model = self.model_input.text().strip()
+        target_languages = [language.strip().lower() for language in self.language_input.text().split(',') if language.strip()]
+        
+        if not target_languages:
+            self.set_status('Ready')
+            self.log("Please enter a target language.")
+            return
+        
+        if not model:
+            self.set_status('Ready')
+            self.log("Please enter an Ollama model name.")
+            return
 
-    def translate_text(self, text, model, target_language):
+        language_map = {
+            'spanish': 'español',
+            'italian': 'italiano',
+            'german': 'deutsch',
+            'french': 'français',
+            'portuguese': 'português',
+            'dutch': 'nederlands',
+            'chinese': '中文',
+            'japanese': '日本語',
+            'korean': '한국어',
+        }
+        
+        self.log(f"Ready to translate {len(queued_jobs)} PDF file(s) using model: {model}")
+        for target_language in target_languages:
+            self.log(f"Target language: {target_language.capitalize()} ({language_map.get(target_language, target_language)})")
+        self.log("PDF pages are extracted in the background and translated as they are read.")
+        
+        # Settings are fixed for the whole queue, so editing the form mid-run cannot change a job halfway.
+        self.job_settings = dict(
+            model=model,
+            target_languages=target_languages,
+            concurrency=self.concurrency_input.value(),
+            use_cache=self.cache_checkbox.isChecked(),
+            pack=self.pack_checkbox.isChecked(),
+        )
+        self.failed_jobs = []
         self.btn_translate.setEnabled(False)
+        self.start_next_job()
+
+    def start_next_job(self):
+        if self.current_job is not None:
+            return
+        job = next((job for job in self.jobs if job.status == 'Queued'), None)
+        if job is None:
+            self.on_queue_finished()
+            return
+        
+        if not os.path.exists(job.file_path):
+            job.set_status('Failed', "File not found")
+            self.failed_jobs.append((job, "File not found"))
+            self.start_next_job()
+            return
+        
+        self.current_job = job
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
+        self.log(f"Starting '{os.path.basename(job.file_path)}'")
+        job.set_status('Running', "Starting...")
         
-        self.target_language = target_language
-        self.original_file_path = self.file_path
-        
-        self.translation_worker = TranslationWorker(text, model, target_language, self.file_path)
-        self.translation_worker.progress_update.connect(self.on_progress_update)
-        self.translation_worker.chunk_start.connect(self.on_chunk_start)
-        self.translation_worker.chunk_complete.connect(self.on_chunk_complete)
-        self.translation_worker.finished.connect(self.on_translation_finished)
-        self.translation_worker.error.connect(self.on_translation_error)
-        self.translation_worker.start()
+        settings = self.job_settings
+        service_url = os.environ.get('PDF_GPT_SERVICE')
+        if service_url:
+            # Thin client mode: a running `python service.py` does the work with its own warm model, cache and queue.
+            job.worker = ServiceJobWorker(service_url, settings['model'], settings['target_languages'], job.file_path,
+                                          pack=settings['pack'], cache=settings['use_cache'])
+        else:
+            job.worker = TranslationWorker(None, settings['model'], settings['target_languages'], job.file_path,
+                                           concurrency=settings['concurrency'],
+                                           cache=self.get_translation_cache() if settings['use_cache'] else None,
+                                           extraction_workers=os.cpu_count() or 1, client=self.get_ollama_client(),
+                                           pack=settings['pack'])
+        job.worker.progress_update.connect(self.on_progress_update)
+        job.worker.chunk_start.connect(self.on_chunk_start)
+        job.worker.chunk_complete.connect(self.on_chunk_complete)
+        job.worker.token_stream.connect(self.on_token_stream)
+        job.worker.finished.connect(lambda output_paths, job=job: self.on_translation_finished(job, output_paths))
+        job.worker.error.connect(lambda message, job=job: self.on_translation_error(job, message))
+        job.worker.cancelled.connect(lambda message, job=job: self.on_translation_cancelled(job, message))
+        job.worker.start()
     
-    def on_progress_update(self, status_message, progress_percent):
+    def get_ollama_client(self):
+        if not hasattr(self, 'ollama_client'):
+            from endpoint_pool import create_client
+            self.ollama_client = create_client()
+        return self.ollama_client
+    
+    def get_translation_cache(self):
+        if not hasattr(self, 'translation_cache'):
+            from translation_cache import TranslationCache
+            try:
+                self.translation_cache = TranslationCache()
+            except Exception as e:
+                self.log(f"Translation cache unavailable: {str(e)}")
+                return None
+        return self.translation_cache
+    
+    def clear_translation_cache(self):
+        cache = self.get_translation_cache()
+        if cache is not None:
+            cache.clear()
+            self.log("Translation cache cleared.")
+    
+    def set_status(self, status_message):
         if '<' not in status_message or '>' not in status_message:
             self.status_label.setText(f'<span style="color: #333333;">{status_message}</span>')
         else:
             self.status_label.setText(status_message)
-        self.progress_bar.setValue(progress_percent)
+    
+    def log(self, message):
+        self.pending_console.append(('log', message))
+    
+    def on_progress_update(self, status_message, progress_percent):
+        self.pending_status = status_message
+        self.pending_progress = progress_percent
     
     def on_chunk_start(self, message):
-        self.output_console.append(message)
+        self.pending_console.append(('log', message))
     
     def on_chunk_complete(self, message):
-        self.output_console.append(message)
+        self.pending_console.append(('log', message))
+    
+    def on_token_stream(self, message):
+        # Only the newest preview of a run of previews is ever shown.
+        if self.pending_console and self.pending_console[-1][0] == 'stream':
+            self.pending_console[-1] = ('stream', message)
+        else:
+            self.pending_console.append(('stream', message))
+    
+    def flush_updates(self):
+        if self.pending_status is not None:
+            self.set_status(self.pending_status)
+            self.pending_status = None
+        if self.pending_progress is not None:
+            self.progress_bar.setValue(self.pending_progress)
+            if self.current_job is not None and self.current_job.status == 'Running':
+                self.current_job.set_status('Running', f"{self.pending_progress}%")
+            self.pending_progress = None
+        if not self.pending_console:
+            return
+        
+        entries, self.pending_console = self.pending_console, []
+        if self.streaming_line_active and entries[0][0] == 'stream':
+            cursor = self.output_console.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            cursor.select(QTextCursor.BlockUnderCursor)
+            cursor.removeSelectedText()
+        # One append per tick instead of one per message keeps repaints at the refresh rate.
+        self.output_console.append('\n'.join(message for _, message in entries))
+        self.streaming_line_active = entries[-1][0] == 'stream'
     
-    def on_translation_finished(self, translated_text):
+    def on_translation_finished(self, job, output_paths):
+        self.current_job = None
         try:
-            if hasattr(self, 'original_file_path') and self.original_file_path:
-                base_name = os.path.splitext(os.path.basename(self.original_file_path))[0]
-                output_dir = os.path.dirname(self.original_file_path)
-                target_lang_lower = self.target_language.lower().replace(' ', '_')
-                output_filename = f"{base_name}_{target_lang_lower}.txt"
-                output_file = os.path.join(output_dir, output_filename) if output_dir else output_filename
-            else:
-                target_lang_lower = self.target_language.lower().replace(' ', '_') if hasattr(self, 'target_language') else 'translated'
-                output_file = f'translated_text_{target_lang_lower}.txt'
-            
-            with open(output_file, 'w', encoding='utf-8') as file:
-                file.write(translated_text.strip())
+            job.output_paths = output_paths
+            output_files = list(output_paths.values())
+            self.output_file_path = output_files[0]
             
-            self.output_file_path = output_file
-            
-            checkmark = "✓"
-            self.status_label.setText(f'<span style="color: #22c55e; font-weight: bold; font-size: 14px;">{checkmark} Translation complete!</span>')
+            job.set_status('Done')
             self.progress_bar.setValue(100)
-            self.output_console.append(f"Translation complete! Output saved to '{os.path.basename(output_file)}'")
+            for output_file in output_files:
+                self.log(f"Translation complete! Output saved to '{os.path.basename(output_file)}'")
             self.btn_open_file.setEnabled(True)
-            self.btn_translate.setEnabled(True)
-            self.text_edit.setPlaceholderText("Drag and drop a PDF file here.")
-            self.text_edit.setText("")
         except Exception as e:
-            self.on_translation_error(f"Error saving file: {str(e)}")
+            job.set_status('Failed')
+            self.failed_jobs.append((job, f"Error saving file: {str(e)}"))
+        self.start_next_job()
+    
+    def on_translation_error(self, job, error_message):
+        self.current_job = None
+        job.set_status('Failed')
+        self.log(f"Error during translation of '{os.path.basename(job.file_path)}': {error_message}")
+        self.failed_jobs.append((job, error_message))
+        self.start_next_job()
     
-    def on_translation_error(self, error_message):
-        self.status_label.setText('<span style="color: #ef4444; font-weight: bold;">✗ Error occurred</span>')
+    def on_translation_cancelled(self, job, message):
+        self.current_job = None
+        job.set_status('Cancelled')
+        self.log(f"Cancelled '{os.path.basename(job.file_path)}'. {message}")
+        self.start_next_job()
+    
+    def on_queue_finished(self):
+        model = self.job_settings['model'] if self.job_settings else "unknown"
+        self.job_settings = None
+        self.btn_translate.setEnabled(True)
         self.progress_bar.setVisible(False)
         self.progress_bar.setValue(0)
-        self.btn_translate.setEnabled(True)
-        self.output_console.append(f"Error during translation: {error_message}")
-        self.output_console.append("Make sure Ollama is running and the model is available.")
+        if not self.failed_jobs:
+            checkmark = "✓"
+            self.pending_status = f'<span style="color: #22c55e; font-weight: bold; font-size: 14px;">{checkmark} Translation complete!</span>'
+            return
+        
+        self.pending_status = '<span style="color: #ef4444; font-weight: bold;">✗ Error occurred</span>'
+        self.log("Make sure Ollama is running and the model is available.")
+        self.flush_updates()
         
-        model = self.model_input.text().strip() if hasattr(self, 'model_input') else "unknown"
+        errors = '\n\n'.join(f"{os.path.basename(job.file_path)}:\n{message}" for job, message in self.failed_jobs)
+        self.failed_jobs = []
+        # One dialog for the whole queue, shown after every job has run, so it never holds up the next file.
         QMessageBox.critical(self, "Translation Error", 
-                           f"An error occurred during translation:\n{error_message}\n\nMake sure Ollama is running and the model '{model}' is available.")
+                           f"An error occurred during translation:\n{errors}\n\nMake sure Ollama is running and the model '{model}' is available.")
 
     def open_translated_file(self):
         if hasattr(self, 'output_file_path') and os.path.exists(self.output_file_path):
@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = 'pdfgpt'
+
+
+class StageTiming:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class Metrics:
+    # Stage timings and counters for one or more translation jobs. Every
+    # observation can also be appended to a JSON-lines trace file, and the
+    # totals exported in the Prometheus text format. A scope() keeps its own
+    # totals for one job and passes everything on to the shared parent.
+    def __init__(self, trace_path=None, parent=None):
+        self.stages = {}
+        self.counters = {}
+        self.parent = parent
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+
+    def observe(self, stage, seconds, **attributes):
+        with self._lock:
+            self.stages.setdefault(stage, StageTiming()).add(seconds)
+            if self._trace is not None:
+                record = {'ts': round(time.time(), 6), 'stage': stage, 'seconds': round(seconds, 6),
+                          'thread': threading.current_thread().name}
+                record.update(attributes)
+                self._trace.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self._trace.flush()
+        if self.parent is not None:
+            self.parent.observe(stage, seconds, **attributes)
+
+    def scope(self):
+        return Metrics(parent=self)
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **attributes)
+
+    def count(self, name, value=1):
+        if value:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+            if self.parent is not None:
+                self.parent.count(name, value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'stages': {stage: {'count': timing.count, 'seconds': timing.total, 'max_seconds': timing.max}
+                           for stage, timing in self.stages.items()},
+            }
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+        if snapshot['stages']:
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds summary")
+            for stage, timing in sorted(snapshot['stages'].items()):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {timing["seconds"]:.6f}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {timing["count"]}')
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds_max gauge")
+            for stage, timing in sorted(snapshot['stages'].items()):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_max{{stage="{stage}"}} {timing["max_seconds"]:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Written to a temporary file first so a scraper never reads half a snapshot.
+        partial_path = path + '.tmp'
+        with open(partial_path, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus_text())
+        os.replace(partial_path, path)
+
+    def summary(self, limit=5):
+        stages = sorted(self.snapshot()['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+        parts = [f"{stage} {timing['seconds']:.1f}s/{timing['count']}" for stage, timing in stages[:limit]]
+        return "Time by stage (total/count): " + ', '.join(parts) if parts else "No stage timings recorded"
+
+    def close(self):
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
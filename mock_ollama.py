@@ -0,0 +1,199 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), models=('mock',), latency=0.05, tokens_per_second=500.0,
+                 max_concurrency=4, fail_rate=0.0, context_length=8192):
+        super().__init__(address, MockOllamaHandler)
+        self.models = list(models)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.max_concurrency = max_concurrency
+        self.fail_rate = fail_rate
+        self.context_length = context_length
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.prompt_tokens = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients closing idle keep-alive connections is normal, not worth a traceback.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'peak_in_flight': self.peak_in_flight, 'prompt_tokens': self.prompt_tokens}
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json(200, {'models': [{'name': name} for name in self.server.models]})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path not in ('/api/chat', '/api/show'):
+            self.send_json(404, {'error': 'not found'})
+            return
+        request = self.read_json()
+        if request.get('model') not in self.server.models:
+            self.send_json(404, {'error': f"model '{request.get('model')}' not found"})
+            return
+        if self.path == '/api/show':
+            self.send_json(200, {
+                'parameters': f"num_ctx {self.server.context_length}",
+                'model_info': {'mock.context_length': self.server.context_length},
+            })
+            return
+        messages = request.get('messages') or []
+        if not messages:
+            self.send_json(200, {'model': request['model'], 'message': {'role': 'assistant', 'content': ''}, 'done': True})
+            return
+
+        # Like OLLAMA_NUM_PARALLEL, requests above the limit wait for a free slot.
+        with self.server.slots:
+            server = self.server
+            with server.lock:
+                server.requests += 1
+                request_number = server.requests
+                server.in_flight += 1
+                server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+            try:
+                self.answer(request, messages, request_number)
+            finally:
+                with server.lock:
+                    server.in_flight -= 1
+
+    def answer(self, request, messages, request_number):
+        server = self.server
+        prompt = ''.join(message.get('content', '') for message in messages)
+        prompt_tokens = max(1, len(prompt) // 4)
+        with server.lock:
+            server.prompt_tokens += prompt_tokens
+
+        if server.fail_rate and (request_number * 7919 % 1000) < server.fail_rate * 1000:
+            self.send_json(500, {'error': 'mock failure'})
+            return
+
+        source = messages[-1].get('content', '')
+        source = source.split('\n\n', 1)[1] if '\n\n' in source else source
+        tokens = [word + ' ' for word in source.upper().split()] or ['OK']
+        # Like a real model, generation stops when prompt plus output fill the context window.
+        done_reason = 'stop'
+        room = max(1, server.context_length - prompt_tokens)
+        if len(tokens) > room:
+            tokens = tokens[:room]
+            done_reason = 'length'
+
+        time.sleep(server.latency)
+        started = time.perf_counter()
+        if not request.get('stream', True):
+            time.sleep(len(tokens) / server.tokens_per_second)
+            self.send_json(200, self.final_message(request, ''.join(tokens).strip(), prompt_tokens, len(tokens), started, done_reason))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        delay = 1.0 / server.tokens_per_second
+        for token in tokens:
+            self.write_chunk({'model': request['model'], 'message': {'role': 'assistant', 'content': token}, 'done': False})
+            time.sleep(delay)
+        final = self.final_message(request, '', prompt_tokens, len(tokens), started, done_reason)
+        self.write_chunk(final)
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def write_chunk(self, data):
+        line = json.dumps(data).encode('utf-8') + b'\n'
+        self.wfile.write(b'%x\r\n' % len(line) + line + b'\r\n')
+        self.wfile.flush()
+
+    def final_message(self, request, content, prompt_tokens, eval_count, started, done_reason='stop'):
+        return {
+            'model': request['model'],
+            'message': {'role': 'assistant', 'content': content},
+            'done': True,
+            'done_reason': done_reason,
+            'prompt_eval_count': prompt_tokens,
+            'eval_count': eval_count,
+            'eval_duration': int((time.perf_counter() - started) * 1e9),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks and manual testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--model', dest='models', action='append', help="Model name to advertise (repeatable, default: mock)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--max-concurrency', type=int, default=4, help="Requests generated at once; the rest wait")
+    parser.add_argument('--context-length', type=int, default=8192, help="Context window reported by /api/show")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Fraction of chat requests answered with HTTP 500")
+    args = parser.parse_args(argv)
+
+    server = MockOllamaServer(
+        (args.host, args.port),
+        models=args.models or ['mock'],
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        max_concurrency=args.max_concurrency,
+        fail_rate=args.fail_rate,
+        context_length=args.context_length,
+    )
+    print(f"Mock Ollama listening on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import json
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+DEFAULT_KEEP_ALIVE = "30m"
+# Context window Ollama runs a model with unless num_ctx says otherwise.
+DEFAULT_NUM_CTX = 4096
+
+
+class OllamaError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Status {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class NoResponseError(requests.exceptions.ConnectionError):
+    # The idle timeout ran out before the first token: the server accepted the
+    # request but is not answering, which says nothing about the chunk.
+    pass
+
+
+class RequestAborted(requests.exceptions.RequestException):
+    # The caller aborted the request through the function chat() passed to on_open.
+    pass
+
+
+# chat() sets on_send for the duration of its request; see AbortableConnectionMixin.
+_sending = threading.local()
+
+
+class AbortableConnectionMixin:
+    # Hands the socket of each request sent from this thread to chat(), so the
+    # request can be aborted before Ollama sends anything, e.g. while it loads
+    # the model or evaluates the prompt.
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        on_send = getattr(_sending, 'on_send', None)
+        if on_send is not None:
+            on_send(self.sock)
+
+
+class AbortableHTTPConnection(AbortableConnectionMixin, HTTPConnection):
+    pass
+
+
+class AbortableHTTPSConnection(AbortableConnectionMixin, HTTPSConnection):
+    pass
+
+
+class AbortableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = AbortableHTTPConnection
+
+
+class AbortableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = AbortableHTTPSConnection
+
+
+class AbortableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': AbortableHTTPConnectionPool, 'https': AbortableHTTPSConnectionPool}
+
+
+class ChatResult:
+    def __init__(self, content, final_response, started, first_token_at, finished, headers_at=None):
+        self.content = content
+        self.final_response = final_response
+        self.latency = finished - started
+        self.time_to_headers = headers_at - started if headers_at is not None else None
+        self.time_to_first_token = first_token_at - started if first_token_at is not None else None
+        self.generation_seconds = finished - first_token_at if first_token_at is not None else None
+        self.load_seconds = final_response.get('load_duration', 0) / 1e9
+        self.prompt_eval_seconds = final_response.get('prompt_eval_duration', 0) / 1e9
+        self.prompt_eval_count = final_response.get('prompt_eval_count', 0)
+        self.eval_count = final_response.get('eval_count', 0)
+        eval_duration = final_response.get('eval_duration', 0)
+        self.tokens_per_second = self.eval_count / (eval_duration / 1e9) if eval_duration else None
+
+    def summary(self):
+        parts = [f"latency {self.latency:.1f}s"]
+        if self.time_to_first_token is not None:
+            parts.append(f"first token {self.time_to_first_token:.1f}s")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} tokens/s")
+        return ', '.join(parts)
+
+
+class OllamaClient:
+    # Shared by every client in the process, keyed by base URL, so repeated
+    # runs and batch jobs skip the /api/tags, /api/show and warm-up round trips.
+    _health_lock = threading.Lock()
+    _model_lists = {}
+    _ready_models = {}
+    _context_lengths = {}
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, pool_size=16, health_ttl=60, ready_ttl=300, context_ttl=300):
+        self.base_url = base_url.rstrip('/')
+        self.health_ttl = health_ttl
+        self.ready_ttl = ready_ttl
+        self.context_ttl = context_ttl
+        self.session = requests.Session()
+        adapter = AbortableAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def list_models(self, timeout=5):
+        response = self.session.get(f"{self.base_url}/api/tags", timeout=timeout)
+        if response.status_code != 200:
+            raise OllamaError(response.status_code, response.text[:200])
+        return [model.get('name', '') for model in response.json().get('models', [])]
+
+    def available_models(self, refresh=False):
+        now = time.monotonic()
+        with self._health_lock:
+            cached = self._model_lists.get(self.base_url)
+        if not refresh and cached is not None and now - cached[0] < self.health_ttl:
+            return cached[1]
+        model_names = self.list_models()
+        with self._health_lock:
+            self._model_lists[self.base_url] = (now, model_names)
+        return model_names
+
+    def has_model(self, model):
+        if model in self.available_models():
+            return True
+        # The cached list may predate an `ollama pull`, so check once more before giving up.
+        return model in self.available_models(refresh=True)
+
+    def show(self, model, timeout=10):
+        response = self.session.post(f"{self.base_url}/api/show", json={"model": model}, timeout=timeout)
+        if response.status_code != 200:
+            raise OllamaError(response.status_code, response.text[:200])
+        return response.json()
+    
+    def context_length(self, model, refresh=False):
+        # The usable window is the model's num_ctx parameter (or Ollama's
+        # default), capped by what the model was trained for.
+        now = time.monotonic()
+        with self._health_lock:
+            cached = self._context_lengths.get((self.base_url, model))
+        if not refresh and cached is not None and now - cached[0] < self.context_ttl:
+            return cached[1]
+        details = self.show(model)
+        trained = [value for key, value in (details.get('model_info') or {}).items() if key.endswith('.context_length')]
+        num_ctx = DEFAULT_NUM_CTX
+        for line in (details.get('parameters') or '').splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[0] == 'num_ctx' and parts[1].isdigit():
+                num_ctx = int(parts[1])
+        context_length = min([num_ctx] + trained)
+        with self._health_lock:
+            self._context_lengths[(self.base_url, model)] = (now, context_length)
+        return context_length
+    
+    def is_ready(self, model):
+        with self._health_lock:
+            ready_at = self._ready_models.get((self.base_url, model))
+        return ready_at is not None and time.monotonic() - ready_at < self.ready_ttl
+
+    def preload(self, model, keep_alive=DEFAULT_KEEP_ALIVE, timeout=(10, 300)):
+        response = self.session.post(
+            f"{self.base_url}/api/chat",
+            json={"model": model, "messages": [], "keep_alive": keep_alive, "stream": False},
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            raise OllamaError(response.status_code, response.text[:200] if response.text else "No error details")
+        self.mark_ready(model)
+
+    def ensure_ready(self, model, keep_alive=DEFAULT_KEEP_ALIVE):
+        if self.is_ready(model):
+            return False
+        self.preload(model, keep_alive)
+        return True
+
+    def mark_ready(self, model):
+        with self._health_lock:
+            self._ready_models[(self.base_url, model)] = time.monotonic()
+
+    def chat(self, model, messages, on_token=None, connect_timeout=10, idle_timeout=180, options=None, keep_alive=None,
+             on_open=None):
+        # on_open, if given, is called with a function that aborts the request
+        # from any thread; chat() then raises RequestAborted.
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True
+        }
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        # With stream=True the read timeout applies to every socket read, so it
+        # measures the time since the last token rather than the whole request.
+        started = time.perf_counter()
+        first_token_at = None
+        parts = []
+        final_response = {}
+        sockets = []
+        aborted = threading.Event()
+
+        def shut_down(sock):
+            try:
+                # Unblocks the read in chat()'s thread; Ollama stops working on a request once its client is gone.
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        def abort():
+            aborted.set()
+            for sock in list(sockets):
+                shut_down(sock)
+
+        def on_send(sock):
+            sockets.append(sock)
+            if aborted.is_set():
+                shut_down(sock)
+
+        if on_open is not None:
+            on_open(abort)
+        _sending.on_send = on_send
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/chat",
+                json=payload,
+                stream=True,
+                timeout=(connect_timeout, idle_timeout)
+            ) as response:
+                headers_at = time.perf_counter()
+                if response.status_code != 200:
+                    raise OllamaError(response.status_code, response.text[:200] if response.text else "No error details")
+                for line in self.iter_lines(response):
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if 'error' in data:
+                        raise OllamaError(response.status_code, data['error'])
+                    token = data.get('message', {}).get('content', '')
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(token)
+                        if on_token is not None:
+                            on_token(token)
+                    if data.get('done'):
+                        final_response = data
+                        break
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if aborted.is_set():
+                raise RequestAborted(f"Request to {self.base_url} was aborted") from e
+            # Only a stall in the middle of generation is a ReadTimeout, the cue to split the chunk.
+            if isinstance(e, requests.exceptions.ReadTimeout) and first_token_at is None:
+                raise NoResponseError(f"{self.base_url} sent no tokens for {idle_timeout} seconds: {str(e)}") from e
+            raise
+        finally:
+            _sending.on_send = None
+        if aborted.is_set():
+            raise RequestAborted(f"Request to {self.base_url} was aborted")
+        self.mark_ready(model)
+        return ChatResult(''.join(parts), final_response, started, first_token_at, time.perf_counter(), headers_at)
+
+    def iter_lines(self, response):
+        # requests reports a read timeout in the body as a ConnectionError;
+        # it is the same stall as one before the headers, so raise it as one.
+        try:
+            yield from response.iter_lines()
+        except requests.exceptions.ConnectionError as e:
+            if e.args and isinstance(e.args[0], ReadTimeoutError):
+                raise requests.exceptions.ReadTimeout(*e.args, request=e.request, response=response) from e
+            raise
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,52 @@
+import os
+import threading
+
+CHUNK_SEPARATOR = '\n\n'
+
+
+def partial_path_for(output_path):
+    return output_path + '.part'
+
+
+class OrderedOutputWriter:
+    # Chunks finish in any order but must land in the file in document order:
+    # early arrivals wait in `pending` until every chunk before them is written.
+    def __init__(self, path):
+        self.path = path
+        self.partial_path = partial_path_for(path)
+        self.next_index = 1
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._file = open(self.partial_path, 'w', encoding='utf-8')
+
+    def put(self, index, text):
+        with self._lock:
+            self.pending[index] = text
+            if index != self.next_index:
+                return
+            while self.next_index in self.pending:
+                text = self.pending.pop(self.next_index)
+                if self.next_index == 1:
+                    self._file.write(text.lstrip())
+                else:
+                    self._file.write(CHUNK_SEPARATOR + text)
+                self.next_index += 1
+            # Flushed per batch so the .part file can be read while the job runs.
+            self._file.flush()
+
+    def commit(self):
+        with self._lock:
+            if self.pending:
+                raise ValueError(f"chunk {self.next_index} was never written")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
@@ -0,0 +1,125 @@
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class ScheduledJob:
+    def __init__(self, job_id, priority, order):
+        self.job_id = job_id
+        self.priority = priority
+        self.order = order
+        self.tasks = deque()
+        self.running = 0
+        self.dispatched = 0
+
+
+class JobExecutor:
+    # The executor a Translator sees: every submit is queued under one job.
+    def __init__(self, scheduler, job_id):
+        self.scheduler = scheduler
+        self.job_id = job_id
+
+    def submit(self, fn, *args, **kwargs):
+        return self.scheduler.submit(self.job_id, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        # The worker threads belong to the scheduler and outlive the job.
+        pass
+
+
+class FairScheduler:
+    # Runs the chunk requests of many jobs on one set of worker threads. The
+    # most urgent priority goes first; jobs of equal priority take turns by
+    # running and dispatched chunk counts, so a short document is not queued
+    # behind every chunk of a long one.
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self._condition = threading.Condition()
+        self._jobs = {}
+        self._order = itertools.count()
+        self._shutdown = False
+        self._threads = [threading.Thread(target=self._work, name=f"scheduler-{index}", daemon=True)
+                         for index in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def executor(self, job_id, priority=0):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                self._jobs[job_id] = ScheduledJob(job_id, priority, next(self._order))
+            else:
+                job.priority = priority
+        return JobExecutor(self, job_id)
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"unknown job {job_id}")
+            job.tasks.append((future, fn, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def remove(self, job_id):
+        # Cancels whatever the job still has queued; running tasks finish on their own.
+        with self._condition:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            for future, _, _, _ in job.tasks:
+                future.cancel()
+
+    def _next_task(self):
+        # Called with the condition held.
+        while True:
+            ready = [job for job in self._jobs.values() if job.tasks]
+            if not ready:
+                return None
+            job = min(ready, key=lambda job: (-job.priority, job.running, job.dispatched, job.order))
+            future, fn, args, kwargs = job.tasks.popleft()
+            if future.set_running_or_notify_cancel():
+                job.running += 1
+                job.dispatched += 1
+                return job, future, fn, args, kwargs
+
+    def _work(self):
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None and not self._shutdown:
+                    self._condition.wait()
+                    task = self._next_task()
+                if task is None:
+                    return
+            job, future, fn, args, kwargs = task
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self._condition:
+                job.running -= 1
+
+    def stats(self):
+        with self._condition:
+            return {job.job_id: {'priority': job.priority, 'queued': len(job.tasks), 'running': job.running,
+                                 'dispatched': job.dispatched}
+                    for job in self._jobs.values()}
+
+    def shutdown(self, wait=True):
+        with self._condition:
+            self._shutdown = True
+            jobs = list(self._jobs.values())
+            self._jobs = {}
+            self._condition.notify_all()
+        for job in jobs:
+            for future, _, _, _ in job.tasks:
+                future.cancel()
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,513 @@
+import argparse
+import itertools
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from endpoint_pool import create_client
+from metrics import Metrics
+from ollama_client import DEFAULT_KEEP_ALIVE
+from scheduler import FairScheduler
+from translation_cache import TranslationCache
+from translator import TranslationCancelled, TranslationError, Translator
+
+DEFAULT_PORT = 11435
+JOB_LOG_LINES = 500
+WARM_INTERVAL = 300
+WARM_RECENT = 1800
+JOB_RETENTION = 3600
+
+
+class ServiceJob:
+    def __init__(self, job_id, file_path, model, languages, priority, options, order):
+        self.job_id = job_id
+        self.file_path = file_path
+        self.model = model
+        self.languages = languages
+        self.priority = priority
+        self.options = options
+        self.order = order
+        self.status = 'queued'
+        self.message = "Waiting for a free slot"
+        self.progress = 0
+        self.outputs = {}
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.translator = None
+        self.cancel_requested = False
+        self.log_lines = deque(maxlen=JOB_LOG_LINES)
+        self.log_count = 0
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        with self._lock:
+            self.log_lines.append(message)
+            self.log_count += 1
+
+    def set_progress(self, message, percent):
+        with self._lock:
+            self.message = message
+            self.progress = percent
+
+    def to_dict(self, since=None):
+        with self._lock:
+            data = {
+                'id': self.job_id,
+                'file_path': self.file_path,
+                'model': self.model,
+                'languages': self.languages,
+                'priority': self.priority,
+                'status': self.status,
+                'message': self.message,
+                'progress': self.progress,
+                'outputs': self.outputs,
+                'error': self.error,
+                'submitted_at': self.submitted_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+            if since is not None:
+                # Lines older than the kept window are gone; the client just resumes from the oldest one left.
+                first = self.log_count - len(self.log_lines)
+                data['log'] = list(self.log_lines)[max(0, since - first):]
+                data['log_next'] = self.log_count
+        return data
+
+
+class TranslationService:
+    # One long-lived process shares the Ollama connection pool, the
+    # translation cache, the warm model and a single chunk scheduler between
+    # every job submitted to it.
+    def __init__(self, client=None, cache=None, concurrency=4, max_active_jobs=8, extraction_workers=1,
+                 keep_alive=DEFAULT_KEEP_ALIVE, warm_models=(), warm_interval=WARM_INTERVAL, warm_recent=WARM_RECENT,
+                 job_retention=JOB_RETENTION, metrics=None):
+        self.concurrency = max(1, concurrency)
+        self.max_active_jobs = max(1, max_active_jobs)
+        self.extraction_workers = max(1, extraction_workers)
+        self.client = client or create_client(pool_size=max(16, self.concurrency))
+        self.cache = cache
+        self.keep_alive = keep_alive
+        self.metrics = metrics or Metrics()
+        self.scheduler = FairScheduler(self.concurrency)
+        self.jobs = {}
+        self.active_jobs = 0
+        self.warm_models = set(warm_models)
+        self.warm_interval = warm_interval
+        # Models of finished jobs stay loaded for warm_recent seconds after their last job.
+        self.warm_recent = warm_recent
+        self.recent_models = {}
+        self.job_retention = job_retention
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._warmer = threading.Thread(target=self.keep_warm, name='keep-warm', daemon=True)
+        self._warmer.start()
+
+    def submit(self, file_path, model, languages, priority=0, pack=False, dedup=True, max_tokens=None, cache=True):
+        if isinstance(languages, str):
+            languages = languages.split(',')
+        languages = [language.strip().lower() for language in languages or [] if language.strip()]
+        if not file_path or not os.path.isfile(file_path):
+            raise ValueError(f"File not found: {file_path}")
+        if not model:
+            raise ValueError("A model name is required")
+        if not languages:
+            raise ValueError("At least one target language is required")
+        options = {'pack': bool(pack), 'dedup': bool(dedup), 'max_tokens': int(max_tokens) if max_tokens else None,
+                   'cache': bool(cache)}
+        job = ServiceJob(uuid.uuid4().hex[:12], os.path.abspath(file_path), model, languages, int(priority), options,
+                         next(self._order))
+        with self._condition:
+            self.jobs[job.job_id] = job
+        self.purge_finished()
+        self.metrics.count('jobs_submitted')
+        threading.Thread(target=self.run_job, args=(job,), name=f"job-{job.job_id}", daemon=True).start()
+        return job
+
+    def next_waiting(self):
+        # Called with the condition held: jobs start by priority, then in submission order.
+        waiting = [job for job in self.jobs.values() if job.status == 'queued' and not job.cancel_requested]
+        return min(waiting, key=lambda job: (-job.priority, job.order), default=None)
+
+    def run_job(self, job):
+        with self._condition:
+            while not job.cancel_requested and not self._stopped.is_set() and (
+                    self.active_jobs >= self.max_active_jobs or self.next_waiting() is not job):
+                self._condition.wait()
+            if job.cancel_requested or self._stopped.is_set():
+                self.finish(job, 'cancelled', message="Cancelled before it started")
+                self._condition.notify_all()
+                return
+            self.active_jobs += 1
+            job.status = 'running'
+            job.started_at = time.time()
+            # The next job in line may fit too.
+            self._condition.notify_all()
+
+        try:
+            translator = Translator(
+                None, job.model, job.languages, job.file_path,
+                max_tokens=job.options['max_tokens'],
+                # Each job may fill the whole scheduler; the scheduler shares it out.
+                concurrency=self.concurrency,
+                cache=self.cache if job.options['cache'] else None,
+                extraction_workers=self.extraction_workers,
+                client=self.client,
+                pack=job.options['pack'],
+                dedup=job.options['dedup'],
+                metrics=self.metrics,
+                keep_alive=self.keep_alive,
+                progress_update=job.set_progress,
+                chunk_complete=job.log,
+            )
+            with self._condition:
+                job.translator = translator
+                if job.cancel_requested:
+                    translator.cancel()
+            outputs = translator.run(executor=self.scheduler.executor(job.job_id, job.priority))
+        except TranslationCancelled as e:
+            self.finish(job, 'cancelled', message=str(e))
+        except TranslationError as e:
+            self.finish(job, 'failed', error=str(e))
+        except Exception as e:
+            self.finish(job, 'failed', error=f"Translation error: {str(e)}")
+        else:
+            self.finish(job, 'done', outputs=outputs)
+            with self._condition:
+                self.recent_models[job.model] = time.monotonic()
+        finally:
+            self.scheduler.remove(job.job_id)
+            with self._condition:
+                self.active_jobs -= 1
+                job.translator = None
+                self._condition.notify_all()
+
+    def finish(self, job, status, message=None, error=None, outputs=None):
+        with job._lock:
+            job.status = status
+            job.finished_at = time.time()
+            job.error = error
+            job.outputs = outputs or {}
+            if status == 'done':
+                job.progress = 100
+                job.message = "Translation complete"
+            else:
+                job.message = message or error
+        self.metrics.count(f'jobs_{status}')
+
+    def cancel(self, job_id):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job.status in ('queued', 'running'):
+                job.cancel_requested = True
+                job.set_progress("Cancelling...", job.progress)
+                if job.translator is not None:
+                    job.translator.cancel()
+                self._condition.notify_all()
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def list_jobs(self):
+        with self._condition:
+            jobs = list(self.jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda job: job.order)]
+
+    def purge_finished(self):
+        # Finished jobs, and their logs, are dropped once nobody is likely to ask for them.
+        cutoff = time.time() - self.job_retention
+        with self._condition:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at is not None and job.translator is None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
+        if expired:
+            self.metrics.count('jobs_purged', len(expired))
+        return expired
+
+    def models_to_warm(self):
+        cutoff = time.monotonic() - self.warm_recent
+        with self._condition:
+            for model, last_used in list(self.recent_models.items()):
+                if last_used < cutoff:
+                    del self.recent_models[model]
+            return sorted(self.warm_models | set(self.recent_models))
+
+    def keep_warm(self):
+        # Reloading before keep_alive runs out means the first chunk of the
+        # next job never waits for the model to load. Models nobody used for
+        # warm_recent seconds are left to unload when keep_alive runs out.
+        while True:
+            self.purge_finished()
+            for model in self.models_to_warm():
+                try:
+                    self.client.preload(model, self.keep_alive)
+                except Exception as e:
+                    print(f"Could not keep model '{model}' loaded: {str(e)}", file=sys.stderr, flush=True)
+            if self._stopped.wait(self.warm_interval):
+                return
+
+    def health(self):
+        with self._condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            active_jobs = self.active_jobs
+        return {
+            'status': 'ok',
+            'ollama': self.client.base_url,
+            'concurrency': self.concurrency,
+            'max_active_jobs': self.max_active_jobs,
+            'active_jobs': active_jobs,
+            'jobs': counts,
+            'warm_models': self.models_to_warm(),
+            'keep_alive': self.keep_alive,
+            'scheduler': self.scheduler.stats(),
+        }
+
+    def close(self):
+        self._stopped.set()
+        with self._condition:
+            for job in self.jobs.values():
+                if job.status in ('queued', 'running'):
+                    job.cancel_requested = True
+                    if job.translator is not None:
+                        job.translator.cancel()
+            self._condition.notify_all()
+        self.scheduler.shutdown(wait=False)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def reject(self, status, error):
+        # The request body is left unread, so the connection cannot carry another request.
+        self.close_connection = True
+        self.send_json(status, {'error': error})
+
+    def host_allowed(self):
+        # A web page can point its own host name at 127.0.0.1 (DNS rebinding) and
+        # then talk to the service from the browser; its requests still carry that
+        # name in Host. The Unix socket server has no allowed_hosts and skips this.
+        allowed_hosts = getattr(self.server, 'allowed_hosts', None)
+        if allowed_hosts is None:
+            return True
+        host = self.headers.get('Host')
+        try:
+            return host is not None and urlsplit(f"//{host}").hostname in allowed_hosts
+        except ValueError:
+            return False
+
+    def route(self):
+        parts = urlsplit(self.path)
+        segments = [unquote(segment) for segment in parts.path.strip('/').split('/') if segment]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        return segments, query
+
+    def do_GET(self):
+        if not self.host_allowed():
+            self.reject(403, 'host not allowed')
+            return
+        service = self.server.service
+        segments, query = self.route()
+        try:
+            if segments == ['health']:
+                self.send_json(200, service.health())
+            elif segments == ['metrics']:
+                self.send_body(200, service.metrics.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+            elif segments == ['jobs']:
+                self.send_json(200, {'jobs': service.list_jobs()})
+            elif len(segments) == 2 and segments[0] == 'jobs':
+                self.send_json(200, service.get(segments[1]).to_dict(since=int(query.get('since', 0))))
+            elif len(segments) == 3 and segments[0] == 'jobs' and segments[2] == 'result':
+                self.send_result(service.get(segments[1]), query.get('language'))
+            else:
+                self.send_json(404, {'error': 'not found'})
+        except KeyError:
+            self.send_json(404, {'error': 'unknown job'})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def send_result(self, job, language):
+        if job.status != 'done':
+            self.send_json(409, {'error': f"job is {job.status}"})
+            return
+        if language is None and len(job.outputs) == 1:
+            language = next(iter(job.outputs))
+        output_path = job.outputs.get((language or '').strip().lower())
+        if output_path is None:
+            self.send_json(400, {'error': f"choose one of: {', '.join(job.outputs)}"})
+            return
+        with open(output_path, 'rb') as file:
+            self.send_body(200, file.read(), 'text/plain; charset=utf-8')
+
+    def do_POST(self):
+        if not self.host_allowed():
+            self.reject(403, 'host not allowed')
+            return
+        segments, _ = self.route()
+        if segments != ['jobs']:
+            self.reject(404, 'not found')
+            return
+        # Browsers send form and text/plain posts cross-origin without asking first, but not JSON ones.
+        if self.headers.get_content_type() != 'application/json':
+            self.reject(415, 'Content-Type must be application/json')
+            return
+        try:
+            request = self.read_json()
+            job = self.server.service.submit(
+                request.get('file_path'), request.get('model'), request.get('languages') or request.get('language'),
+                priority=request.get('priority', 0),
+                pack=request.get('pack', False),
+                dedup=request.get('dedup', True),
+                max_tokens=request.get('max_tokens'),
+                cache=request.get('cache', True),
+            )
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(201, job.to_dict())
+
+    def do_DELETE(self):
+        if not self.host_allowed():
+            self.reject(403, 'host not allowed')
+            return
+        segments, _ = self.route()
+        if len(segments) != 2 or segments[0] != 'jobs':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            self.send_json(200, self.server.service.cancel(segments[1]).to_dict())
+        except KeyError:
+            self.send_json(404, {'error': 'unknown job'})
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, ServiceHandler)
+        self.service = service
+        self.allowed_hosts = {'localhost', '127.0.0.1', address[0].lower()}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class UnixServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        if os.path.exists(socket_path):
+            # Left behind by a service that did not shut down cleanly.
+            os.remove(socket_path)
+        super().__init__(socket_path, ServiceHandler)
+        os.chmod(socket_path, 0o600)
+        self.service = service
+
+    @property
+    def url(self):
+        return f"unix://{self.server_address}"
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run PDF GPT as a local translation service with a shared job queue.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--ollama-url', dest='ollama_urls', action='append',
+                        help="Ollama server as URL[=max parallel requests]; repeatable (default: $OLLAMA_ENDPOINTS or http://localhost:11434)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4,
+                        help="Chunks sent to Ollama at once, shared fairly by all running jobs (default: 4)")
+    parser.add_argument('-j', '--max-jobs', type=int, default=8,
+                        help="Documents extracted and translated at the same time; the rest wait by priority (default: 8). "
+                             "Running jobs share --concurrency chunk by chunk, so a short job started next to a long one finishes early")
+    parser.add_argument('--extraction-workers', type=int, default=1, help="Processes used for PDF text extraction per job")
+    parser.add_argument('--warm-model', dest='warm_models', action='append', default=[],
+                        help="Model to load at startup and keep loaded for as long as the service runs")
+    parser.add_argument('--warm-recent', type=float, default=WARM_RECENT,
+                        help=f"Seconds the model of a finished job is kept loaded after its last job; 0 turns this off (default: {WARM_RECENT})")
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE,
+                        help=f"keep_alive sent to Ollama, e.g. 30m, 2h or -1 for forever (default: {DEFAULT_KEEP_ALIVE})")
+    parser.add_argument('--warm-interval', type=float, default=WARM_INTERVAL,
+                        help=f"Seconds between keep-alive reloads; keep it below --keep-alive (default: {WARM_INTERVAL})")
+    parser.add_argument('--job-retention', type=float, default=JOB_RETENTION,
+                        help=f"Seconds a finished job and its log stay available before they are forgotten (default: {JOB_RETENTION})")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the translation cache")
+    parser.add_argument('--trace', help="Append a JSON line per timed stage to this file")
+    args = parser.parse_args(argv)
+
+    client = create_client(args.ollama_urls, pool_size=max(16, args.concurrency))
+    cache = None if args.no_cache else TranslationCache()
+    metrics = Metrics(args.trace)
+    service = TranslationService(
+        client=client,
+        cache=cache,
+        concurrency=args.concurrency,
+        max_active_jobs=args.max_jobs,
+        extraction_workers=args.extraction_workers,
+        keep_alive=args.keep_alive,
+        warm_models=args.warm_models,
+        warm_interval=args.warm_interval,
+        warm_recent=args.warm_recent,
+        job_retention=args.job_retention,
+        metrics=metrics,
+    )
+    server = UnixServiceServer(args.socket, service) if args.socket else ServiceServer((args.host, args.port), service)
+    print(f"PDF GPT service listening on {server.url} (Ollama: {client.base_url})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        client.close()
+        metrics.close()
+        if cache is not None:
+            cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import http.client
+import json
+import os
+import socket
+from urllib.parse import quote, urlencode, urlsplit
+
+# Standard library only: the GUI imports this at job start and should stay light.
+DEFAULT_SERVICE_URL = "http://127.0.0.1:11435"
+
+
+class ServiceError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Status {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    # Talks to `python service.py`, over TCP ("http://host:port") or a Unix
+    # socket ("unix:///path/to/socket").
+    def __init__(self, url=None, timeout=10):
+        self.url = (url or os.environ.get('PDF_GPT_SERVICE') or DEFAULT_SERVICE_URL).rstrip('/')
+        self.timeout = timeout
+
+    def connection(self):
+        parts = urlsplit(self.url)
+        if parts.scheme == 'unix':
+            return UnixHTTPConnection(parts.path, timeout=self.timeout)
+        if parts.scheme != 'http':
+            raise ValueError(f"Unsupported service URL: {self.url}")
+        return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.timeout)
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection = self.connection()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read().decode('utf-8')
+            if response.status >= 400:
+                try:
+                    message = json.loads(payload).get('error', payload)
+                except ValueError:
+                    message = payload
+                raise ServiceError(response.status, message)
+            if response.getheader('Content-Type', '').startswith('application/json'):
+                return json.loads(payload)
+            return payload
+        finally:
+            connection.close()
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def submit(self, file_path, model, languages, priority=0, **options):
+        if isinstance(languages, str):
+            languages = [languages]
+        # The service resolves paths on its own side, so send an absolute one.
+        data = dict(options, file_path=os.path.abspath(file_path), model=model, languages=list(languages), priority=priority)
+        return self.request('POST', '/jobs', data)
+
+    def jobs(self):
+        return self.request('GET', '/jobs')['jobs']
+
+    def status(self, job_id, since=0):
+        return self.request('GET', f"/jobs/{quote(job_id)}?{urlencode({'since': since})}")
+
+    def cancel(self, job_id):
+        return self.request('DELETE', f"/jobs/{quote(job_id)}")
+
+    def result(self, job_id, language=None):
+        query = f"?{urlencode({'language': language})}" if language else ''
+        return self.request('GET', f"/jobs/{quote(job_id)}/result{query}")
@@ -0,0 +1,143 @@
+import time
+
+from boilerplate import BoilerplateFilter, placeholder_ids, placeholders_intact
+from chunker import iter_chunks
+from ollama_client import ChatResult
+from translation_cache import TranslationCache
+from translator import Translator
+
+
+BODIES = ["Revenue grew.", "Costs fell.", "Margins held.", "Outlook is stable.", "Hiring continues.",
+          "Debt was repaid.", "Sales rose in Asia.", "The board met."]
+
+
+def make_page(number, body):
+    return f"ACME Corp Quarterly Report\n{body}\nPage {number} of 12"
+
+
+def filter_pages(boilerplate, pages):
+    return [boilerplate.filter_page(page)[0] for page in pages]
+
+
+def test_repeated_header_and_footer_become_placeholders():
+    boilerplate = BoilerplateFilter()
+    pages = filter_pages(boilerplate, [make_page(n, BODIES[n]) for n in range(1, 4)])
+    assert pages[0] == make_page(1, BODIES[1])
+    assert len(placeholder_ids(pages[1])) == 2
+    assert BODIES[2] in pages[1]
+    assert placeholder_ids(pages[1]) == placeholder_ids(pages[2])
+
+
+def test_near_duplicates_are_not_merged():
+    boilerplate = BoilerplateFilter()
+    pages = filter_pages(boilerplate, [
+        "Board meeting minutes, 3 March 2024\nThe board met.",
+        "Board meeting minutes, 3 April 2024\nThe board met again.",
+        "Board meeting minutes, 4 March 2024\nThe board met once more.",
+        "Board meeting minutes, 5 March 2024\nThe board met one last time.",
+    ])
+    # Same shape, different month: translating it once would turn April into March.
+    assert "Board meeting minutes, 3 April 2024" in pages[1]
+    assert placeholder_ids(pages[2]) == placeholder_ids(pages[3])
+    occurrences = boilerplate.take('\n'.join(pages))
+    spliced = boilerplate.splice('\n'.join(pages), occurrences, lambda block: "Protokoll der Vorstandssitzung, 4. März 2024")
+    assert "Protokoll der Vorstandssitzung, 4. März 2024" in spliced
+    assert "Protokoll der Vorstandssitzung, 5. März 2024" in spliced
+    assert "April" in spliced
+
+
+def test_each_copy_gets_its_own_numbers_back():
+    boilerplate = BoilerplateFilter()
+    pages = filter_pages(boilerplate, [make_page(n, BODIES[n]) for n in range(1, 5)])
+    text = '\n\n'.join(pages[1:])
+    occurrences = boilerplate.take(text)
+    translations = {block.block_id: ("Seite 2 von 12" if "Page" in block.text else "ACME Quartalsbericht")
+                    for block, _ in occurrences}
+    spliced = boilerplate.splice(text, occurrences, lambda block: translations[block.block_id])
+    for number in (2, 3, 4):
+        assert f"Seite {number} von 12" in spliced
+    assert spliced.count("ACME Quartalsbericht") == 3
+
+
+def test_reordered_numbers_follow_their_values():
+    boilerplate = BoilerplateFilter()
+    pages = filter_pages(boilerplate, [make_page(n, BODIES[n]) for n in range(1, 5)])
+    text = '\n\n'.join(pages[1:])
+    occurrences = boilerplate.take(text)
+    translations = {block.block_id: ("12ページ中2ページ" if "Page" in block.text else "ACME 四半期報告書")
+                    for block, _ in occurrences}
+    spliced = boilerplate.splice(text, occurrences, lambda block: translations[block.block_id])
+    for number in (2, 3, 4):
+        assert f"12ページ中{number}ページ" in spliced
+
+
+def test_numbers_that_cannot_be_mapped_keep_the_source_line():
+    boilerplate = BoilerplateFilter()
+    pages = filter_pages(boilerplate, [make_page(n, BODIES[n]) for n in range(1, 5)])
+    text = '\n\n'.join(pages[1:])
+    occurrences = boilerplate.take(text)
+    translations = {block.block_id: ("Seite zwei von zwölf" if "Page" in block.text else "ACME Quartalsbericht")
+                    for block, _ in occurrences}
+    spliced = boilerplate.splice(text, occurrences, lambda block: translations[block.block_id])
+    assert spliced.count("Seite zwei von zwölf") == 1
+    assert "Page 3 of 12" in spliced
+    assert "Page 4 of 12" in spliced
+
+
+def test_placeholders_do_not_depend_on_earlier_pages():
+    pages = [make_page(n, BODIES[n]) for n in range(1, 6)]
+    inserted = pages[:2] + ["An inserted page that mentions a Disclaimer: all figures are unaudited and subject to change."] + pages[2:]
+    before = filter_pages(BoilerplateFilter(), pages)
+    after = filter_pages(BoilerplateFilter(), inserted)
+    assert before[2:] == after[3:]
+
+
+def test_take_follows_chunk_order():
+    boilerplate = BoilerplateFilter()
+    text = '\n'.join(filter_pages(boilerplate, [make_page(n, BODIES[n] * 20) for n in range(1, 8)]))
+    chunks = list(iter_chunks(text, 60))
+    occurrences = [boilerplate.take(chunk) for chunk in chunks]
+    assert sum(len(taken) for taken in occurrences) == len(boilerplate.occurrences)
+    expanded = ''.join(boilerplate.expand(chunk, taken) for chunk, taken in zip(chunks, occurrences))
+    assert not placeholder_ids(expanded)
+    assert "Page 7 of 12" in expanded
+
+
+def test_missing_placeholder_falls_back_to_source_line():
+    boilerplate = BoilerplateFilter()
+    page = filter_pages(boilerplate, [make_page(n, BODIES[n]) for n in (1, 2)])[1]
+    occurrences = boilerplate.take(page)
+    spliced = boilerplate.splice(page, occurrences, lambda block: None)
+    assert spliced == make_page(2, BODIES[2])
+    assert not placeholders_intact(page, "ACME Quartalsbericht\nDie Margen hielten.")
+
+
+class ScriptedClient:
+    # Answers chat requests from a list of reply functions, one per request.
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def chat(self, model, messages, on_token=None, idle_timeout=None, keep_alive=None, on_open=None):
+        text = messages[1]["content"].split("\n\n", 1)[1]
+        self.prompts.append(text)
+        now = time.perf_counter()
+        return ChatResult(self.replies.pop(0)(text), {'done': True}, now, now, now)
+
+
+def test_translator_retries_without_placeholders_when_the_model_drops_one(tmp_path):
+    boilerplate = BoilerplateFilter()
+    chunk = filter_pages(boilerplate, [make_page(n, BODIES[n]) for n in (1, 2)])[1]
+    client = ScriptedClient([
+        lambda text: "Die Margen hielten.",
+        lambda text: text.replace(BODIES[2], "Die Margen hielten."),
+    ])
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    translator = Translator(None, 'mistral', 'german', str(tmp_path / "doc.pdf"), max_tokens=500, cache=cache, client=client)
+    translator.boilerplate = boilerplate
+    translator.chunk_occurrences = {1: boilerplate.take(chunk)}
+    translation = translator.translate_chunk(chunk, 1, 'german')
+    assert translation == make_page(2, "Die Margen hielten.")
+    assert client.prompts[1] == make_page(2, BODIES[2])
+    assert translator.metrics.counters['placeholder_fallbacks'] == 1
+    assert cache.get(translator.cache_key(chunk, 'german')) is None
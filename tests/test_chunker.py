@@ -0,0 +1,155 @@
+import random
+
+import pytest
+
+from chunker import AdaptiveTokenBudget, chunk_text, estimate_tokens, iter_stream_chunks
+
+WORDS = "the quick brown fox jumps over a lazy dog while translators read long contracts and technical manuals".split()
+
+
+def make_text(paragraphs, seed=0):
+    rng = random.Random(seed)
+    result = []
+    for _ in range(paragraphs):
+        sentences = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + rng.choice('.!?')
+                     for _ in range(rng.randint(1, 8))]
+        result.append(' '.join(sentences))
+    return '\n\n'.join(result)
+
+
+@pytest.mark.parametrize('max_tokens', [20, 100, 400, 1200])
+def test_chunks_join_back_to_text(max_tokens):
+    text = make_text(200)
+    assert ''.join(chunk_text(text, max_tokens)) == text
+
+
+@pytest.mark.parametrize('max_tokens', [20, 100, 400, 1200])
+def test_chunks_stay_within_token_budget(max_tokens):
+    chunks = chunk_text(make_text(200, seed=1), max_tokens)
+    assert all(chunk for chunk in chunks)
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= max_tokens
+
+
+def test_chunks_end_on_sentence_boundaries():
+    chunks = chunk_text(make_text(200, seed=2), 200)
+    assert all(chunk.rstrip()[-1] in '.!?' for chunk in chunks)
+
+
+def test_cjk_text_counts_one_token_per_character():
+    text = '今日は良い天気です。明日は雨が降るでしょう。' * 200
+    chunks = chunk_text(text, 50)
+    assert ''.join(chunks) == text
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 50
+    assert all(chunk.endswith('。') for chunk in chunks)
+
+
+def test_oversized_word_is_split_within_budget():
+    word = 'x' * 5000
+    text = f"Before the long word. {word} After the long word."
+    chunks = chunk_text(text, 100)
+    assert ''.join(chunks) == text
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 100
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text('', 100) == []
+
+
+def test_edit_only_changes_nearby_chunks():
+    text = make_text(300, seed=3)
+    edited = text.replace(' ', ' inserted words here ', 1)
+    original_chunks = chunk_text(text, 300)
+    edited_chunks = chunk_text(edited, 300)
+    # Boundaries follow the content, so chunks after the edit line up again.
+    reused = set(original_chunks) & set(edited_chunks)
+    assert len(reused) >= len(original_chunks) - 5
+
+
+def split_at_random(text, pieces, seed=0):
+    # Like PDF pages: the cuts land anywhere, mid-sentence and mid-word included.
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), pieces - 1))
+    return [text[start:stop] for start, stop in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('max_tokens', [30, 200, 800])
+def test_streaming_matches_whole_text(seed, max_tokens):
+    text = make_text(60, seed=seed)
+    pages = split_at_random(text, 12, seed=seed)
+    assert list(iter_stream_chunks(pages, max_tokens)) == chunk_text(text, max_tokens)
+
+
+def test_streaming_matches_whole_text_at_line_ends():
+    text = '今日は良い天気です。明日は雨が降るでしょう。\n' * 50 + make_text(20) + '\n'
+    pages = [line + '\n' for line in text.split('\n')]
+    assert list(iter_stream_chunks(pages, 40)) == chunk_text(''.join(pages), 40)
+
+
+def table_page(number):
+    # No sentence punctuation and no blank lines, like a table or a form.
+    return '\n'.join(' | '.join(f"r{number}c{column} value" for column in range(6)) for _ in range(30)) + '\n'
+
+
+@pytest.mark.parametrize('max_tokens', [30, 200, 1200])
+def test_streaming_without_sentence_boundaries_matches_whole_text(max_tokens):
+    pages = [table_page(number) for number in range(40)]
+    assert list(iter_stream_chunks(pages, max_tokens)) == chunk_text(''.join(pages), max_tokens)
+
+
+def test_streaming_without_sentence_boundaries_keeps_the_buffer_bounded():
+    consumed = []
+
+    def pages():
+        for number in range(1000):
+            consumed.append(number)
+            yield table_page(number)
+
+    chunks = iter_stream_chunks(pages(), 200)
+    next(chunks)
+    assert len(consumed) <= 2
+
+
+@pytest.mark.parametrize('max_tokens', [5, 50])
+def test_streaming_splits_a_word_longer_than_the_budget_like_whole_text(max_tokens):
+    text = "Start. " + "x" * 997 + "字" * 300 + " end of it. " + "y" * 450
+    pieces = split_at_random(text, 12)
+    assert list(iter_stream_chunks(pieces, max_tokens)) == chunk_text(text, max_tokens)
+
+
+def record_speed(budget, tokens_per_second, count=8):
+    # Chunks whose translation is as long as the source, with no overhead besides generation.
+    for _ in range(count):
+        budget.record(500, 500 / tokens_per_second, 500, 500 / tokens_per_second)
+
+
+def test_adaptive_budget_changes_only_between_documents():
+    budget = AdaptiveTokenBudget(1000, ceiling=8000, target_seconds=60)
+    record_speed(budget, 100)
+    assert budget.value == 6000
+    assert budget.step == 1000
+    assert budget.next_step() == 4000
+
+
+def test_adaptive_budget_ignores_noise_around_a_step():
+    budget = AdaptiveTokenBudget(1000, ceiling=8000, target_seconds=60)
+    record_speed(budget, 30)
+    assert budget.next_step() == 1000
+    for tokens_per_second in (14, 20, 33):
+        record_speed(budget, tokens_per_second)
+        assert budget.next_step() == 1000
+    record_speed(budget, 10)
+    assert budget.next_step() == 500
+
+
+def test_adaptive_budget_shrinks_below_the_current_step():
+    budget = AdaptiveTokenBudget(1000, ceiling=8000)
+    budget.shrink()
+    assert budget.next_step() == 500
+
+
+def test_adaptive_budget_shrinks_once_per_step():
+    budget = AdaptiveTokenBudget(1200, ceiling=8000)
+    for _ in range(5):
+        budget.shrink()
+    assert budget.next_step() == 600
@@ -0,0 +1,47 @@
+import pytest
+import requests
+
+from endpoint_pool import EndpointPool
+from mock_ollama import MockOllamaServer
+
+MESSAGES = [{'role': 'user', 'content': "Translate:\n\none two three four"}]
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**kwargs):
+        server = MockOllamaServer(**kwargs).start()
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.stop()
+
+
+def make_pool(*servers):
+    return EndpointPool([(server.base_url, 2) for server in servers])
+
+
+def test_server_that_never_answers_is_ejected(servers):
+    silent = servers(latency=2.0)
+    healthy = servers(latency=0.0)
+    pool = make_pool(silent, healthy)
+    # The first request goes to the first endpoint; it is ejected and the chunk goes to the other one.
+    result = pool.chat('mock', MESSAGES, idle_timeout=0.5)
+    assert result.content.strip() == "ONE TWO THREE FOUR"
+    assert [stat['ejected'] for stat in pool.stats()] == [True, False]
+    pool.close()
+
+
+def test_stall_mid_generation_keeps_the_server(servers):
+    slow = servers(latency=0.0, tokens_per_second=1.0)
+    other = servers(latency=0.0, tokens_per_second=1.0)
+    pool = make_pool(slow, other)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        pool.chat('mock', MESSAGES, idle_timeout=0.5)
+    assert [stat['ejected'] for stat in pool.stats()] == [False, False]
+    assert sum(stat['requests'] for stat in pool.stats()) == 1
+    pool.close()
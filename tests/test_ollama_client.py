@@ -0,0 +1,33 @@
+import pytest
+import requests
+
+from mock_ollama import MockOllamaServer
+from ollama_client import OllamaClient
+
+
+@pytest.fixture
+def slow_server():
+    server = MockOllamaServer(latency=0.0, tokens_per_second=1.0).start()
+    yield server
+    server.stop()
+
+
+def test_stall_while_streaming_is_a_read_timeout(slow_server):
+    client = OllamaClient(slow_server.base_url)
+    messages = [{'role': 'user', 'content': "Translate:\n\none two three four"}]
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.chat('mock', messages, idle_timeout=0.5)
+    client.close()
+
+
+def test_context_length_is_cached_per_server_and_model():
+    server = MockOllamaServer(context_length=8192).start()
+    try:
+        assert OllamaClient(server.base_url).context_length('mock') == 8192
+        server.context_length = 2048
+        # A new client, as each run() of the service gets, still skips /api/show.
+        assert OllamaClient(server.base_url).context_length('mock') == 8192
+        assert OllamaClient(server.base_url).context_length('mock', refresh=True) == 2048
+        assert OllamaClient(server.base_url, context_ttl=0).context_length('mock') == 2048
+    finally:
+        server.stop()
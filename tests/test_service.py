@@ -0,0 +1,89 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from service import ServiceServer, TranslationService
+
+
+class PreloadRecorder:
+    base_url = 'http://ollama.test'
+
+    def __init__(self):
+        self.preloaded = []
+
+    def preload(self, model, keep_alive=None):
+        self.preloaded.append(model)
+
+
+@pytest.fixture
+def service():
+    service = TranslationService(client=PreloadRecorder(), warm_models=['mistral'], warm_interval=3600,
+                                 warm_recent=60, job_retention=60)
+    yield service
+    service.close()
+
+
+def make_job(service, tmp_path, name):
+    path = tmp_path / f"{name}.pdf"
+    path.write_bytes(b'')
+    job = service.submit(str(path), 'mock', 'german')
+    service.cancel(job.job_id)
+    while job.finished_at is None or job.translator is not None:
+        time.sleep(0.01)
+    return job
+
+
+def test_recently_used_models_expire(service):
+    service.recent_models['llama3'] = time.monotonic()
+    service.recent_models['gemma3'] = time.monotonic() - 120
+    assert service.models_to_warm() == ['llama3', 'mistral']
+    assert 'gemma3' not in service.recent_models
+
+
+def test_finished_jobs_are_purged_after_retention(service, tmp_path):
+    old = make_job(service, tmp_path, 'old')
+    recent = make_job(service, tmp_path, 'recent')
+    old.finished_at -= 120
+    assert service.purge_finished() == [old.job_id]
+    assert [job['id'] for job in service.list_jobs()] == [recent.job_id]
+    with pytest.raises(KeyError):
+        service.get(old.job_id)
+
+
+@pytest.fixture
+def server(service):
+    server = ServiceServer(('127.0.0.1', 0), service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def send(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_requests_for_other_hosts_are_refused(server):
+    assert send(server, 'GET', '/health')[0] == 200
+    assert send(server, 'GET', '/health', headers={'Host': f'localhost:{server.server_address[1]}'})[0] == 200
+    assert send(server, 'GET', '/health', headers={'Host': 'attacker.example:11435'})[0] == 403
+    assert send(server, 'DELETE', '/jobs/1', headers={'Host': 'attacker.example'})[0] == 403
+
+
+def test_job_submissions_must_be_json(server, tmp_path):
+    body = json.dumps({'file_path': str(tmp_path / 'missing.pdf'), 'model': 'mock', 'language': 'german'})
+    assert send(server, 'POST', '/jobs', body, {'Content-Type': 'text/plain'})[0] == 415
+    assert send(server, 'POST', '/jobs', body)[0] == 415
+    assert server.service.list_jobs() == []
+    status, reply = send(server, 'POST', '/jobs', body, {'Content-Type': 'application/json; charset=utf-8'})
+    assert status == 400
+    assert 'missing.pdf' in reply['error']
@@ -0,0 +1,19 @@
+import pytest
+
+from benchmark import LAZY_MODULES, probe_import, probe_window, startup_env, startup_failures
+
+
+@pytest.mark.parametrize('module', sorted(LAZY_MODULES))
+def test_entry_point_imports_within_budget(module):
+    case = probe_import(module, startup_env())
+    if case.get('skipped', '').startswith('ModuleNotFoundError'):
+        pytest.skip(f"import {module} needs a dependency that is not installed: {case['skipped']}")
+    assert 'skipped' not in case, case['skipped']
+    assert startup_failures(case) == []
+
+
+def test_window_opens_within_budget():
+    pytest.importorskip('PyQt5')
+    case = probe_window(startup_env())
+    assert 'skipped' not in case, case['skipped']
+    assert startup_failures(case) == []
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from chunker import AdaptiveTokenBudget
+from endpoint_pool import EndpointPool
+from metrics import Metrics
+from mock_ollama import MockOllamaServer
+from ollama_client import ChatResult
+from translation_cache import TranslationCache
+from translator import ChunkTooLargeError, ChunkTranslationError, TranslationCancelled, Translator
+
+
+class FailingClient:
+    base_url = 'http://ollama.test'
+
+    def __init__(self, error):
+        self.error = error
+        self.requests = 0
+
+    def chat(self, model, messages, on_token=None, idle_timeout=None, keep_alive=None, on_open=None):
+        self.requests += 1
+        raise self.error
+
+
+def make_translator(client):
+    translator = Translator("Some text.", 'mistral', 'german', None, client=client)
+    translator.token_budget = AdaptiveTokenBudget(1200)
+    return translator
+
+
+def test_connect_timeout_is_not_treated_as_a_large_chunk():
+    client = FailingClient(requests.exceptions.ConnectTimeout("connect timed out"))
+    translator = make_translator(client)
+    with pytest.raises(ChunkTranslationError) as error:
+        translator.translate_chunk("First sentence. " * 200, 1, 'german')
+    assert not isinstance(error.value, ChunkTooLargeError)
+    assert client.requests == 1
+    assert translator.token_budget.value == 1200
+
+
+def test_read_timeout_splits_the_chunk():
+    client = FailingClient(requests.exceptions.ReadTimeout("read timed out"))
+    translator = make_translator(client)
+    with pytest.raises(ChunkTooLargeError):
+        translator.translate_chunk("First sentence. " * 200, 1, 'german')
+    assert client.requests > 1
+    assert translator.token_budget.next_step() == 600
+
+
+class EchoClient:
+    base_url = 'http://ollama.test'
+
+    def chat(self, model, messages, on_token=None, idle_timeout=None, keep_alive=None, on_open=None):
+        now = time.perf_counter()
+        text = messages[1]["content"].split("\n\n", 1)[1]
+        return ChatResult(text.upper(), {'done': True, 'eval_count': 10, 'eval_duration': 10 ** 9}, now, now, now)
+
+
+def test_cache_counts_and_timings_are_per_document(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    shared = Metrics()
+    first = Translator("One.", 'mistral', 'german', None, cache=cache, client=EchoClient(), metrics=shared)
+    second = Translator("Two.", 'mistral', 'german', None, cache=cache, client=EchoClient(), metrics=shared)
+    first.translate_chunk("One.", 1, 'german')
+    second.translate_chunk("One.", 1, 'german')
+    second.translate_chunk("Two.", 2, 'german')
+    assert (first.cache_hits, first.cache_misses) == (0, 1)
+    assert (second.cache_hits, second.cache_misses) == (1, 1)
+    first.metrics.observe('write', 1.0)
+    second.metrics.count('retries')
+    assert 'write' not in second.metrics.snapshot()['stages']
+    assert 'retries' not in first.metrics.counters
+    assert shared.counters['retries'] == 1
+    assert shared.snapshot()['stages']['write']['count'] == 1
+
+
+def test_cancel_closes_a_request_before_its_first_token():
+    # The mock's latency stands in for Ollama loading the model: nothing is sent back until it is over.
+    servers = [MockOllamaServer(latency=5.0).start() for _ in range(2)]
+    pool = EndpointPool([(server.base_url, 1) for server in servers])
+    translator = Translator("Some text.", 'mock', 'german', None, client=pool)
+    threading.Timer(0.3, translator.cancel).start()
+    started = time.monotonic()
+    try:
+        with pytest.raises(TranslationCancelled):
+            translator.translate_chunk("Some text.", 1, 'german')
+        assert time.monotonic() - started < 2
+        # A cancelled request is not the server's fault.
+        assert not any(stat['failures'] for stat in pool.stats())
+        assert sum(stat['requests'] for stat in pool.stats()) == 1
+    finally:
+        pool.close()
+        for server in servers:
+            server.stop()
@@ -0,0 +1,776 @@
+import os
+import re
+import statistics
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import requests
+
+from boilerplate import BoilerplateFilter, placeholders_intact
+from checkpoint import (CHECKPOINT_VERSION, Checkpoint, checkpoint_path_for, chunk_digest, read_checkpoint_header,
+                        source_fingerprint)
+from chunker import (AdaptiveTokenBudget, chunk_text, estimate_tokens, iter_stream_chunks, token_budget_for_model,
+                     token_ceiling_for_context)
+from endpoint_pool import EndpointPool, create_client
+from extraction import iter_pages
+from metrics import Metrics
+from ollama_client import DEFAULT_KEEP_ALIVE, OllamaError, RequestAborted
+from output_writer import OrderedOutputWriter
+from translation_cache import TranslationCache
+
+SYSTEM_PROMPT_TEMPLATE = "CRITICAL INSTRUCTION: You are a translator. You MUST translate text to {language} ({native}). Output ONLY in {language} ({native})."
+USER_PROMPT_TEMPLATE = "Translate this text from its original language to {language} ({native}) ONLY. Output the translation ONLY in {language} ({native}):\n\n{text}"
+PACKED_PROMPT_TEMPLATE = "The text below has {count} segments. Each segment starts with a marker line such as <<<1>>>. Translate every segment separately and copy each marker line unchanged, in the same order."
+
+# In packing mode the document is cut into segments this many times smaller
+# than the token budget, and up to MAX_PACKED_SEGMENTS of them share a request.
+PACK_SEGMENT_DIVISOR = 8
+MAX_PACKED_SEGMENTS = 16
+MAX_SHRINK_DEPTH = 3
+SEGMENT_MARKER_RE = re.compile(r'<<<\s*(\d+)\s*>>>')
+
+LANGUAGE_NAMES = {
+    'spanish': 'español',
+    'italian': 'italiano',
+    'german': 'deutsch',
+    'french': 'français',
+    'portuguese': 'português',
+    'dutch': 'nederlands',
+    'russian': 'русский',
+    'chinese': '中文',
+    'japanese': '日本語',
+    'korean': '한국어',
+    'arabic': 'العربية',
+    'polish': 'polski',
+    'greek': 'ελληνικά',
+    'turkish': 'türkçe',
+}
+
+
+# What the request summary and the benchmark need from a ChatResult; the
+# result itself holds the whole translation and is not kept.
+RequestStat = namedtuple('RequestStat', 'latency time_to_first_token eval_count eval_seconds')
+
+
+class TranslationError(Exception):
+    pass
+
+
+class TranslationCancelled(TranslationError):
+    pass
+
+
+class ChunkTranslationError(Exception):
+    pass
+
+
+class ChunkTooLargeError(ChunkTranslationError):
+    # Timed out or ran out of context: worth retrying in smaller pieces.
+    pass
+
+
+class PlaceholderMismatchError(ChunkTranslationError):
+    # The model dropped or invented a [[Bnnnnnn]] placeholder: retry with the lines written out.
+    pass
+
+
+def output_path_for(file_path, target_language):
+    target_lang_lower = target_language.lower().replace(' ', '_')
+    if file_path:
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        output_dir = os.path.dirname(file_path)
+        output_filename = f"{base_name}_{target_lang_lower}.txt"
+        return os.path.join(output_dir, output_filename) if output_dir else output_filename
+    return f'translated_text_{target_lang_lower}.txt'
+
+
+class Translator:
+    def __init__(self, text, model, target_language, file_path, max_tokens=None, concurrency=1, cache=None, extraction_workers=1,
+                 resume=True, client=None, pack=False, dedup=True, metrics=None, keep_alive=DEFAULT_KEEP_ALIVE, progress_update=None,
+                 chunk_start=None, chunk_complete=None, token_update=None, token_interval=0.25):
+        self.text = text
+        self.model = model
+        if isinstance(target_language, str):
+            target_language = [target_language]
+        self.target_languages = list(dict.fromkeys(language.strip() for language in target_language if language.strip()))
+        self.file_path = file_path
+        self.max_tokens = max_tokens or token_budget_for_model(model)
+        # Without an explicit budget, chunk size follows the model's context window and measured speed.
+        self.adaptive = max_tokens is None and not pack
+        self.token_budget = None
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.extraction_workers = max(1, extraction_workers)
+        self.resume = resume
+        self.pack = pack
+        self.segment_tokens = max(1, self.max_tokens // PACK_SEGMENT_DIVISOR) if pack else self.max_tokens
+        self.packed_fallbacks = 0
+        self.dedup = dedup
+        self.keep_alive = keep_alive
+        self.boilerplate = None
+        self.block_futures = {}
+        self.chunk_occurrences = {}
+        self.checkpoints = {}
+        self.writers = {}
+        self.failed_chunks = {}
+        self.progress_update = progress_update or (lambda message, percent: None)
+        self.chunk_start = chunk_start or (lambda message: None)
+        self.chunk_complete = chunk_complete or (lambda message: None)
+        self.token_update = token_update or (lambda message: None)
+        self.token_interval = token_interval
+        self.client = client or create_client(pool_size=max(16, self.concurrency))
+        # This document's own totals; everything is also counted in the shared metrics passed in.
+        self.metrics = (metrics or Metrics()).scope()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.document = os.path.basename(file_path) if file_path else 'text'
+        self.cancelled = threading.Event()
+        self._open_requests = set()
+        self.request_stats = []
+        self._stats_lock = threading.Lock()
+        self._last_token_update = 0.0
+    
+    def run(self, executor=None):
+        try:
+            if not self.target_languages:
+                raise TranslationError("Please enter a target language.")
+            
+            self.chunk_start("Checking if Ollama is running...")
+            try:
+                with self.metrics.span('health_check', document=self.document):
+                    model_found = self.client.has_model(self.model)
+                if not model_found:
+                    model_names = self.client.available_models()
+                    raise TranslationError(f"Model '{self.model}' not found in Ollama.\nAvailable models: {', '.join(model_names) if model_names else 'none'}\n\nUse 'ollama pull {self.model}' to download the model.")
+                    
+            except TranslationError:
+                raise
+            except OllamaError as e:
+                raise TranslationError(f"Ollama health check failed. Status: {e.status_code}\nMake sure Ollama is running on {self.client.base_url}")
+            except requests.exceptions.Timeout:
+                raise TranslationError("Timeout connecting to Ollama. Make sure Ollama is running and responding.")
+            except requests.exceptions.ConnectionError:
+                raise TranslationError(f"Cannot connect to Ollama at {self.client.base_url}\nMake sure Ollama is running.")
+            except requests.exceptions.RequestException as e:
+                raise TranslationError(f"Error checking Ollama: {str(e)}\nMake sure Ollama is running on {self.client.base_url}")
+            except Exception as e:
+                raise TranslationError(f"Error verifying Ollama: {str(e)}")
+            
+            self.chunk_complete("Ollama connection verified, model found")
+            
+            chunk_tokens = self.segment_tokens
+            if self.adaptive:
+                self.token_budget = AdaptiveTokenBudget.shared((self.client.base_url, self.model), self.max_tokens, self.context_token_ceiling())
+                chunk_tokens = self.token_budget.next_step()
+            
+            if self.resume and self.text is None and self.file_path:
+                def checkpoint_header(target_language, chunk_tokens):
+                    return dict(
+                        source_fingerprint(self.file_path),
+                        model=self.model,
+                        target_language=target_language.strip().lower(),
+                        max_tokens=chunk_tokens,
+                        prompt=chunk_digest(SYSTEM_PROMPT_TEMPLATE + USER_PROMPT_TEMPLATE),
+                    )
+                
+                if self.adaptive:
+                    # A resumed document is cut at the size it was started with, so its chunks match the checkpoint.
+                    for target_language in self.target_languages:
+                        saved = read_checkpoint_header(checkpoint_path_for(output_path_for(self.file_path, target_language)))
+                        if saved and saved == dict(checkpoint_header(target_language, saved.get('max_tokens')), version=CHECKPOINT_VERSION):
+                            chunk_tokens = saved['max_tokens']
+                            break
+                for target_language in self.target_languages:
+                    checkpoint = Checkpoint(checkpoint_path_for(output_path_for(self.file_path, target_language)),
+                                            checkpoint_header(target_language, chunk_tokens))
+                    self.checkpoints[target_language] = checkpoint
+                    if checkpoint.completed:
+                        self.chunk_complete(f"Resuming {target_language} from checkpoint: {len(checkpoint.completed)} chunks already translated")
+            if chunk_tokens != self.segment_tokens:
+                self.chunk_complete(f"Chunks of up to {chunk_tokens} tokens for this document")
+            
+            # Translations go straight to disk in document order instead of piling up in memory.
+            for target_language in self.target_languages:
+                self.writers[target_language] = OrderedOutputWriter(output_path_for(self.file_path, target_language))
+            self.failed_chunks = {target_language: {} for target_language in self.target_languages}
+            total_chunks = 0
+            submitted = 0
+            completed = 0
+            resumed = 0
+            extracted_pages = 0
+            total_pages = 0
+            extracted_chars = 0
+            source_seconds = 0.0
+            self.cache_hits = self.cache_misses = 0
+            
+            def collect(done_futures):
+                nonlocal completed
+                for future in done_futures:
+                    target_language, batch = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except ChunkTranslationError as e:
+                        results = e
+                    if not isinstance(results, dict):
+                        results = {chunk_idx: results for chunk_idx, _ in batch}
+                    for chunk_idx, chunk in batch:
+                        completed += 1
+                        translation = results[chunk_idx]
+                        if isinstance(translation, ChunkTranslationError):
+                            self.metrics.count('chunks_failed')
+                            self.failed_chunks[target_language][chunk_idx] = str(translation)
+                            self.writers[target_language].put(chunk_idx, f"[Chunk {chunk_idx} could not be translated]")
+                            self.chunk_complete(f"{self.label(target_language)}Chunk {chunk_idx} failed ({completed}/{submitted} done): {str(translation)}")
+                            continue
+                        with self.metrics.span('write', document=self.document, chunk=chunk_idx, language=target_language):
+                            if self.boilerplate is not None:
+                                translation = self.boilerplate.splice(translation, self.chunk_occurrences.get(chunk_idx, []),
+                                                                      lambda block: self.block_translation(block, target_language))
+                            self.writers[target_language].put(chunk_idx, translation)
+                            if target_language in self.checkpoints:
+                                self.checkpoints[target_language].record(chunk_idx, chunk, translation)
+                        self.chunk_complete(f"{self.label(target_language)}Chunk {chunk_idx} completed ({completed}/{submitted} done)")
+                    
+                    extracted_fraction = extracted_pages / total_pages if total_pages else 1
+                    progress_percent = int((completed / submitted) * extracted_fraction * 95)
+                    self.progress_update(f"Translated {completed}/{submitted} chunks (page {extracted_pages}/{total_pages} extracted)...", progress_percent)
+            
+            def iter_source():
+                nonlocal extracted_pages, total_pages, extracted_chars, source_seconds
+                if self.text is not None:
+                    extracted_pages = total_pages = 1
+                    extracted_chars = len(self.text)
+                    yield self.text
+                    return
+                pages = iter_pages(self.file_path, self.extraction_workers, metrics=self.metrics)
+                while True:
+                    started = time.perf_counter()
+                    page = next(pages, None)
+                    if page is None:
+                        return
+                    page_number, page_count, page_text = page
+                    self.metrics.observe('page_wait', time.perf_counter() - started, document=self.document, page=page_number)
+                    extracted_pages, total_pages = page_number, page_count
+                    extracted_chars += len(page_text) + 1
+                    if self.boilerplate is not None:
+                        with self.metrics.span('dedup', document=self.document, page=page_number):
+                            page_text, new_blocks = self.boilerplate.filter_page(page_text)
+                        if new_blocks:
+                            # Repeated lines are translated once, on their own, and spliced into every copy.
+                            batch = [(block.block_id, block.text) for block in new_blocks]
+                            for target_language in self.target_languages:
+                                future = executor.submit(self.queued, time.perf_counter(), self.translate_packed, batch, target_language)
+                                for block in new_blocks:
+                                    self.block_futures[(target_language, block.block_id)] = future
+                    source_seconds += time.perf_counter() - started
+                    yield page_text + '\n'
+            
+            def iter_timed_chunks(chunks):
+                # Time spent inside the chunker, minus the extraction it waited on.
+                while True:
+                    started = time.perf_counter()
+                    source_before = source_seconds
+                    chunk = next(chunks, None)
+                    self.metrics.observe('chunking', time.perf_counter() - started - (source_seconds - source_before), document=self.document)
+                    if chunk is None:
+                        return
+                    yield chunk
+            
+            self.boilerplate = BoilerplateFilter() if self.dedup and self.text is None else None
+            self.block_futures = {}
+            self.chunk_occurrences = {}
+            self.chunk_start(f"Translating into {', '.join(self.target_languages)} with up to {self.concurrency} parallel request(s)...")
+            pending = {}
+            own_executor = executor is None
+            if own_executor:
+                executor = ThreadPoolExecutor(max_workers=self.concurrency)
+            try:
+                # The preload runs next to extraction instead of ahead of it; chunk
+                # requests sent before it finishes simply wait for the model to load.
+                if self.client.is_ready(self.model):
+                    warmup_future = None
+                    self.chunk_complete("Model is ready (checked recently)")
+                else:
+                    self.chunk_start("Loading model in the background (this may take a moment)...")
+                    warmup_future = executor.submit(self.client.ensure_ready, self.model, self.keep_alive)
+                
+                def submit(batch):
+                    nonlocal submitted, completed, resumed
+                    # Each chunk is extracted once and fanned out to every target language.
+                    for target_language in self.target_languages:
+                        checkpoint = self.checkpoints.get(target_language)
+                        remaining = []
+                        for chunk_idx, chunk in batch:
+                            submitted += 1
+                            resumed_translation = checkpoint.get(chunk_idx, chunk) if checkpoint is not None else None
+                            if resumed_translation is not None:
+                                self.writers[target_language].put(chunk_idx, resumed_translation)
+                                completed += 1
+                                resumed += 1
+                            else:
+                                remaining.append((chunk_idx, chunk))
+                        if not remaining:
+                            continue
+                        if self.pack:
+                            future = executor.submit(self.queued, time.perf_counter(), self.translate_packed, remaining, target_language)
+                        else:
+                            future = executor.submit(self.queued, time.perf_counter(), self.translate_chunk, remaining[0][1], remaining[0][0], target_language)
+                        pending[future] = (target_language, remaining)
+                        if len(pending) >= self.concurrency * 2:
+                            done_futures, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            collect(done_futures)
+                
+                batch = []
+                batch_tokens = 0
+                for chunk in iter_timed_chunks(iter_stream_chunks(iter_source(), chunk_tokens)):
+                    self.check_cancelled()
+                    if not chunk.strip():
+                        continue
+                    total_chunks += 1
+                    if self.boilerplate is not None:
+                        self.chunk_occurrences[total_chunks] = self.boilerplate.take(chunk)
+                    if not self.pack:
+                        submit([(total_chunks, chunk)])
+                        continue
+                    segment_tokens_estimate = estimate_tokens(chunk)
+                    if batch and (batch_tokens + segment_tokens_estimate > self.max_tokens or len(batch) >= MAX_PACKED_SEGMENTS):
+                        submit(batch)
+                        batch = []
+                        batch_tokens = 0
+                    batch.append((total_chunks, chunk))
+                    batch_tokens += segment_tokens_estimate
+                if batch:
+                    submit(batch)
+                collect(as_completed(list(pending)))
+                
+                warmup_error = None
+                if warmup_future is not None:
+                    try:
+                        warmup_future.result()
+                        self.chunk_complete("Model loaded and kept warm")
+                    except Exception as e:
+                        warmup_error = self.describe_warmup_error(e)
+                        self.chunk_complete(f"Warning: model preload failed: {warmup_error}")
+            finally:
+                # Only non-empty after an error or cancel: drop chunks that have not started yet.
+                for future in pending:
+                    future.cancel()
+                if own_executor:
+                    executor.shutdown()
+                for checkpoint in self.checkpoints.values():
+                    checkpoint.close()
+            
+            self.chunk_complete(f"Extracted {extracted_chars} characters from {total_pages} page(s) into {total_chunks} chunks")
+            self.metrics.count('documents')
+            self.metrics.count('pages', total_pages)
+            self.metrics.count('source_chars', extracted_chars)
+            self.metrics.count('chunks', total_chunks * len(self.target_languages))
+            self.metrics.count('chunks_resumed', resumed)
+            if resumed:
+                self.chunk_complete(f"Reused {resumed} chunks from checkpoints")
+            if self.boilerplate is not None and self.boilerplate.blocks:
+                self.chunk_complete(self.boilerplate.summary())
+                self.metrics.count('dedup_saved_chars', self.boilerplate.saved_chars * len(self.target_languages))
+                self.metrics.count('dedup_saved_tokens', self.boilerplate.saved_tokens * len(self.target_languages))
+            if self.request_stats:
+                self.chunk_complete(self.summarize_request_stats())
+            if self.packed_fallbacks:
+                self.chunk_complete(f"{self.packed_fallbacks} packed request(s) fell back to one request per segment")
+            if isinstance(self.client, EndpointPool):
+                self.chunk_complete(f"Endpoints: {self.client.summary()}")
+            
+            if self.cache is not None:
+                self.chunk_complete(f"Translation cache: {self.cache_hits} hits, {self.cache_misses} misses")
+                self.metrics.count('cache_hits', self.cache_hits)
+                self.metrics.count('cache_misses', self.cache_misses)
+            self.chunk_complete(self.metrics.summary())
+            
+            output_files = {}
+            first_error = None
+            for target_language in self.target_languages:
+                failed_chunks = self.failed_chunks[target_language]
+                if total_chunks and len(failed_chunks) == total_chunks:
+                    first_error = first_error or warmup_error or f"All {total_chunks} chunks failed to translate.\n\n{failed_chunks[min(failed_chunks)]}"
+                    self.chunk_complete(f"{self.label(target_language)}All {total_chunks} chunks failed; no output will be written")
+                    self.writers.pop(target_language).abort()
+                    continue
+                
+                if failed_chunks:
+                    failed_list = ', '.join(str(chunk_idx) for chunk_idx in sorted(failed_chunks))
+                    self.chunk_complete(f"{self.label(target_language)}Warning: {len(failed_chunks)} of {total_chunks} chunks failed and are marked in the output: {failed_list}")
+                    if target_language in self.checkpoints:
+                        self.chunk_complete("Translate the file again to retry only the failed chunks.")
+                
+                output_files[target_language] = self.writers.pop(target_language).commit()
+                self.complete_checkpoint(target_language)
+            
+            if not output_files:
+                raise TranslationError(first_error)
+            
+            return output_files
+            
+        except TranslationError:
+            raise
+        except Exception as e:
+            raise TranslationError(f"Translation error: {str(e)}")
+        finally:
+            for writer in self.writers.values():
+                writer.abort()
+            self.writers = {}
+
+    def describe_warmup_error(self, e):
+        if isinstance(e, OllamaError):
+            curl_cmd = f"curl {self.client.base_url}/api/generate -d '{{\"model\":\"{self.model}\",\"prompt\":\"test\"}}'"
+            return f"Model test failed: Status {e.status_code}\nResponse: {e.text}\n\nTry testing Ollama manually: {curl_cmd}"
+        if isinstance(e, requests.exceptions.Timeout):
+            return f"Model load timed out after 5 minutes.\nThe model '{self.model}' might be:\n- Still loading into GPU memory\n- Too large for your system\n- Not compatible\n\nError: {str(e)}\n\nTry testing manually: ollama run {self.model}"
+        if isinstance(e, requests.exceptions.ConnectionError):
+            return f"Connection error during model load: {str(e)}\nMake sure Ollama is running."
+        return f"Model test error: {str(e)}\n\nTry testing manually: ollama run {self.model}"
+    
+    def cancel(self):
+        # Safe to call from any thread. Queued chunks are skipped and open
+        # requests are closed at once, which also stops Ollama working on them.
+        self.cancelled.set()
+        with self._stats_lock:
+            aborts = list(self._open_requests)
+        for abort in aborts:
+            abort()
+    
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise TranslationCancelled("Translation cancelled. Finished chunks are kept in the checkpoint.")
+    
+    def queued(self, submitted_at, func, *args):
+        self.metrics.observe('queue_wait', time.perf_counter() - submitted_at, document=self.document)
+        self.check_cancelled()
+        return func(*args)
+    
+    def record_request(self, result, **attributes):
+        with self._stats_lock:
+            self.request_stats.append(RequestStat(result.latency, result.time_to_first_token, result.eval_count,
+                                                  result.final_response.get('eval_duration', 0) / 1e9))
+        attributes['document'] = self.document
+        stages = [
+            ('request', result.latency),
+            ('http_headers', result.time_to_headers),
+            ('time_to_first_token', result.time_to_first_token),
+            ('generation', result.generation_seconds),
+            ('model_load', result.load_seconds),
+            ('prompt_eval', result.prompt_eval_seconds),
+        ]
+        for stage, seconds in stages:
+            if seconds:
+                self.metrics.observe(stage, seconds, **attributes)
+        self.metrics.count('requests')
+        self.metrics.count('prompt_tokens', result.prompt_eval_count)
+        self.metrics.count('eval_tokens', result.eval_count)
+    
+    def summarize_request_stats(self):
+        with self._stats_lock:
+            results = list(self.request_stats)
+        latencies = [result.latency for result in results]
+        first_tokens = [result.time_to_first_token for result in results if result.time_to_first_token is not None]
+        eval_tokens = sum(result.eval_count for result in results)
+        eval_seconds = sum(result.eval_seconds for result in results)
+        summary = f"Ollama: {len(results)} requests, median latency {statistics.median(latencies):.1f}s"
+        if first_tokens:
+            summary += f", median first token {statistics.median(first_tokens):.1f}s"
+        if eval_seconds:
+            summary += f", {eval_tokens / eval_seconds:.1f} tokens/s"
+        return summary
+    
+    def block_translation(self, block, target_language):
+        try:
+            translation = self.block_futures[(target_language, block.block_id)].result()[block.block_id]
+        except Exception:
+            return None
+        return None if isinstance(translation, ChunkTranslationError) else translation
+    
+    def label(self, target_language):
+        return f"[{target_language}] " if len(self.target_languages) > 1 else ''
+    
+    def complete_checkpoint(self, target_language):
+        checkpoint = self.checkpoints.get(target_language)
+        if checkpoint is not None and not self.failed_chunks.get(target_language):
+            checkpoint.discard()
+            del self.checkpoints[target_language]
+    
+    def language_names(self, target_language):
+        target_lang_capitalized = target_language.strip().lower().capitalize()
+        return target_lang_capitalized, LANGUAGE_NAMES.get(target_lang_capitalized.lower(), target_lang_capitalized)
+    
+    def build_messages(self, text, target_language):
+        target_lang_capitalized, target_lang_native = self.language_names(target_language)
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT_TEMPLATE.format(language=target_lang_capitalized, native=target_lang_native)
+            },
+            {
+                "role": "user",
+                "content": USER_PROMPT_TEMPLATE.format(language=target_lang_capitalized, native=target_lang_native, text=text)
+            }
+        ]
+    
+    def token_preview(self, name):
+        streamed_tokens = []
+        
+        def on_token(token):
+            self.check_cancelled()
+            streamed_tokens.append(token)
+            now = time.monotonic()
+            if now - self._last_token_update >= self.token_interval:
+                self._last_token_update = now
+                preview = ''.join(streamed_tokens)[-120:].replace('\n', ' ')
+                self.token_update(f"{name}: ...{preview}")
+        
+        return on_token
+    
+    def chat(self, messages, name, idle_timeout=180):
+        # Registers the request while it is open, so cancel() can close it even
+        # before the first token, while Ollama loads the model or reads the prompt.
+        opened = []
+
+        def on_open(abort):
+            opened.append(abort)
+            with self._stats_lock:
+                self._open_requests.add(abort)
+            if self.cancelled.is_set():
+                abort()
+
+        try:
+            return self.client.chat(self.model, messages, on_token=self.token_preview(name),
+                                    idle_timeout=idle_timeout, keep_alive=self.keep_alive, on_open=on_open)
+        except RequestAborted:
+            self.check_cancelled()
+            raise
+        finally:
+            with self._stats_lock:
+                self._open_requests.difference_update(opened)
+    
+    def cache_key(self, chunk, target_language):
+        if self.cache is None:
+            return None
+        return TranslationCache.make_key(chunk, self.model, target_language, SYSTEM_PROMPT_TEMPLATE + USER_PROMPT_TEMPLATE)
+    
+    def cache_lookup(self, cache_key):
+        # Counted here rather than read off the cache, which other jobs share.
+        translation = self.cache.get(cache_key)
+        with self._stats_lock:
+            if translation is None:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+        return translation
+    
+    def clean_response(self, content, target_language):
+        target_lang_capitalized, _ = self.language_names(target_language)
+        content = content.strip()
+        
+        prefixes_to_remove = [
+            f"translation:",
+            f"in {target_lang_capitalized.lower()}:",
+            f"{target_lang_capitalized.lower()}:",
+            f"{target_lang_capitalized}:",
+            "translation to",
+            "translated:",
+            "here's the translation:",
+            "here is the translation:",
+        ]
+        
+        content_lower = content.lower()
+        for prefix in prefixes_to_remove:
+            if content_lower.startswith(prefix):
+                content = content[len(prefix):].strip()
+                content = content.lstrip(":-\n").strip()
+                break
+        
+        lines = content.split('\n')
+        cleaned_lines = []
+        skip_patterns = [
+            'original:',
+            'text:',
+            'source:',
+        ]
+        
+        in_translation = True
+        for line in lines:
+            line_lower = line.lower().strip()
+            if any(pattern in line_lower and ':' in line_lower for pattern in skip_patterns):
+                in_translation = False
+                continue
+            if target_lang_capitalized.lower() in line_lower and ':' in line_lower:
+                in_translation = True
+                if ':' in line:
+                    line = line.split(':', 1)[1].strip()
+            if in_translation and line.strip():
+                cleaned_lines.append(line)
+        
+        return '\n'.join(cleaned_lines).strip() if cleaned_lines else content.strip()
+    
+    def context_token_ceiling(self):
+        try:
+            context_length = self.client.context_length(self.model)
+        except (requests.exceptions.RequestException, OllamaError, ValueError) as e:
+            self.chunk_complete(f"Could not read the model's context window ({str(e)}); chunks stay at {self.max_tokens} tokens or less")
+            return None
+        ceiling = token_ceiling_for_context(context_length, estimate_tokens(SYSTEM_PROMPT_TEMPLATE + USER_PROMPT_TEMPLATE))
+        self.chunk_complete(f"Model context window: {context_length} tokens, so chunks stay at {ceiling} tokens or less")
+        return ceiling
+    
+    def translate_chunk(self, chunk, chunk_idx, target_language, depth=0):
+        try:
+            return self.translate_pieces(chunk, chunk_idx, target_language, depth)
+        except PlaceholderMismatchError as e:
+            occurrences = self.chunk_occurrences.get(chunk_idx) if depth == 0 else None
+            if not occurrences:
+                raise
+            self.metrics.count('placeholder_fallbacks')
+            self.chunk_complete(f"{self.label(target_language)}Chunk {chunk_idx}: {e}; retrying with the repeated lines written out")
+            return self.translate_pieces(self.boilerplate.expand(chunk, occurrences), chunk_idx, target_language, depth)
+    
+    def translate_pieces(self, chunk, chunk_idx, target_language, depth):
+        try:
+            return self.request_chunk(chunk, chunk_idx, target_language)
+        except ChunkTooLargeError as e:
+            pieces = chunk_text(chunk, max(1, estimate_tokens(chunk) // 2))
+            if depth >= MAX_SHRINK_DEPTH or len(pieces) < 2:
+                raise
+            self.metrics.count('retries')
+            if self.token_budget is not None:
+                self.chunk_complete(f"Chunk size for the next documents reduced to {self.token_budget.shrink()} tokens")
+            self.chunk_complete(f"{self.label(target_language)}Chunk {chunk_idx} was too large ({str(e).splitlines()[0]}); retrying in {len(pieces)} parts")
+        translation = '\n\n'.join(
+            self.translate_chunk(piece, f"{chunk_idx}.{number}", target_language, depth + 1)
+            for number, piece in enumerate(pieces, 1)
+        )
+        cache_key = self.cache_key(chunk, target_language)
+        if cache_key is not None:
+            self.cache.put(cache_key, translation)
+        return translation
+    
+    def request_chunk(self, chunk, chunk_idx, target_language):
+        self.chunk_start(f"{self.label(target_language)}Translating chunk {chunk_idx}...")
+        
+        try:
+            cache_key = self.cache_key(chunk, target_language)
+            if cache_key is not None:
+                cached_translation = self.cache_lookup(cache_key)
+                if cached_translation is not None:
+                    self.chunk_start(f"Chunk {chunk_idx} found in translation cache")
+                    return cached_translation
+            
+            self.chunk_start(f"Sending request to Ollama for chunk {chunk_idx}...")
+            
+            messages = self.build_messages(chunk, target_language)
+            timeout_seconds = 180
+            
+            target_lang_capitalized, target_lang_native = self.language_names(target_language)
+            self.chunk_start(f"Translating to {target_lang_capitalized} ({target_lang_native})")
+            
+            try:
+                result = self.chat(messages, f"Chunk {chunk_idx}", idle_timeout=timeout_seconds)
+            except requests.exceptions.ConnectionError as e:
+                # Also catches ConnectTimeout and NoResponseError: a server that does not answer says nothing about the chunk's size.
+                raise ChunkTranslationError(f"Connection error for chunk {chunk_idx}: {str(e)}\nMake sure Ollama is still running and the model is loaded.")
+            except requests.exceptions.Timeout as e:
+                raise ChunkTooLargeError(f"Ollama stopped sending tokens for {timeout_seconds} seconds in the middle of chunk {chunk_idx}.\nError: {str(e)}")
+            except OllamaError as e:
+                raise ChunkTranslationError(f"Ollama API error for chunk {chunk_idx}: Status {e.status_code}\nResponse: {e.text}\n\nCheck Ollama logs for more details.")
+            
+            self.record_request(result, chunk=chunk_idx, language=target_language)
+            self.chunk_start(f"Received response from Ollama for chunk {chunk_idx} ({result.summary()})")
+            
+            if result.final_response.get('done_reason') == 'length':
+                raise ChunkTooLargeError(f"Output for chunk {chunk_idx} was cut off after {result.eval_count} tokens: the model's context window is full")
+            if self.token_budget is not None and result.final_response:
+                previous = self.token_budget.value
+                self.token_budget.record(estimate_tokens(chunk), result.latency, result.eval_count,
+                                         result.final_response.get('eval_duration', 0) / 1e9)
+                if abs(self.token_budget.value - previous) * 5 > previous:
+                    self.chunk_complete(f"Measured speed suits chunks of {self.token_budget.value} tokens (~{self.token_budget.target_seconds}s per request); "
+                                        f"the next documents are sized from it")
+            
+            if result.final_response:
+                with self.metrics.span('postprocess', document=self.document, chunk=chunk_idx, language=target_language):
+                    final_content = self.clean_response(result.content, target_language)
+                
+                if final_content and not placeholders_intact(chunk, final_content):
+                    raise PlaceholderMismatchError(f"the translation of chunk {chunk_idx} does not keep its [[B...]] placeholders")
+                if final_content:
+                    if cache_key is not None:
+                        self.cache.put(cache_key, final_content)
+                    return final_content
+                else:
+                    raise ChunkTranslationError(f"Empty or invalid response from Ollama for chunk {chunk_idx}")
+            else:
+                raise ChunkTranslationError(f"Ollama stream for chunk {chunk_idx} ended before the response was complete")
+        except (ChunkTranslationError, TranslationCancelled):
+            raise
+        except requests.exceptions.ConnectionError as e:
+            raise ChunkTranslationError(f"Connection error translating chunk {chunk_idx}: {str(e)}")
+        except requests.exceptions.Timeout:
+            raise ChunkTooLargeError(f"Timeout: Ollama stopped sending tokens for {timeout_seconds} seconds in the middle of chunk {chunk_idx}")
+        except requests.exceptions.RequestException as e:
+            raise ChunkTranslationError(f"Connection error translating chunk {chunk_idx}: {str(e)}")
+        except Exception as e:
+            raise ChunkTranslationError(f"Error translating chunk {chunk_idx}: {str(e)}")
+    
+    def translate_packed(self, batch, target_language):
+        # Returns {chunk_idx: translation or ChunkTranslationError} for a batch of small segments.
+        results = {}
+        remaining = []
+        for chunk_idx, chunk in batch:
+            cache_key = self.cache_key(chunk, target_language)
+            cached_translation = self.cache_lookup(cache_key) if cache_key is not None else None
+            if cached_translation is not None:
+                results[chunk_idx] = cached_translation
+            else:
+                remaining.append((chunk_idx, chunk))
+        
+        if len(remaining) > 1:
+            first, last = remaining[0][0], remaining[-1][0]
+            self.chunk_start(f"{self.label(target_language)}Translating chunks {first}-{last} in one request...")
+            packed_text = '\n\n'.join(f"<<<{number}>>>\n{chunk.strip()}" for number, (_, chunk) in enumerate(remaining, 1))
+            messages = self.build_messages(packed_text, target_language)
+            messages[1]["content"] = PACKED_PROMPT_TEMPLATE.format(count=len(remaining)) + "\n" + messages[1]["content"]
+            try:
+                result = self.chat(messages, f"Chunks {first}-{last}")
+                self.record_request(result, chunk=f"{first}-{last}", language=target_language)
+                translations = self.split_packed_response(result.content, [chunk for _, chunk in remaining], target_language) if result.final_response else None
+            except (requests.exceptions.RequestException, OllamaError) as e:
+                self.chunk_start(f"Packed request for chunks {first}-{last} failed: {str(e)}")
+                translations = None
+            
+            if translations is not None:
+                for (chunk_idx, chunk), translation in zip(remaining, translations):
+                    results[chunk_idx] = translation
+                    cache_key = self.cache_key(chunk, target_language)
+                    if cache_key is not None:
+                        self.cache.put(cache_key, translation)
+                return results
+            self.metrics.count('packed_fallbacks')
+            with self._stats_lock:
+                self.packed_fallbacks += 1
+            self.chunk_start(f"Packed response for chunks {first}-{last} did not match; translating them one by one")
+        
+        for chunk_idx, chunk in remaining:
+            try:
+                results[chunk_idx] = self.translate_chunk(chunk, chunk_idx, target_language)
+            except ChunkTranslationError as e:
+                results[chunk_idx] = e
+        return results
+    
+    def split_packed_response(self, content, chunks, target_language):
+        parts = SEGMENT_MARKER_RE.split(content)
+        numbers = [int(number) for number in parts[1::2]]
+        translations = [self.clean_response(text, target_language) for text in parts[2::2]]
+        # Anything but exactly one non-empty translation per marker, in order, with every placeholder kept, is not trusted.
+        if numbers != list(range(1, len(chunks) + 1)) or not all(translations):
+            return None
+        if not all(placeholders_intact(chunk, translation) for chunk, translation in zip(chunks, translations)):
+            return None
+        return translations